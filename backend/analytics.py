@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple
+
+import config
+from database import ConnectionPool, get_pool, rollup_analytics
+
+
+class Snapshot(NamedTuple):
+    generated_at: float  # unix time the statistics were read
+    data: Dict
+
+
+class AnalyticsAggregator:
+    """Analytics windows computed in the background and served from memory.
+
+    The rollup triggers fold every logged query and vote into the daily tables
+    as they arrive; refresh() re-reads the tracked windows from those tables and
+    swaps in a new set of snapshots, so polling dashboards never touch SQLite.
+    A window without a snapshot yet is computed once on the spot and tracked
+    from then on, up to max_windows of them.
+    """
+
+    def __init__(self, pool: ConnectionPool, windows=config.ANALYTICS_WINDOWS, max_windows: int = 16):
+        self.pool = pool
+        self.max_windows = max_windows
+        self._windows = list(windows)
+        self._snapshots: Dict[int, Snapshot] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        conn = self.pool.connection()
+        self._snapshots = {
+            days: Snapshot(time.time(), rollup_analytics(conn, days)) for days in list(self._windows)
+        }
+
+    def get(self, days: int) -> Dict:
+        """Latest snapshot of a window, with when it was generated and how old it is"""
+        snapshot = self._snapshots.get(days)
+        if snapshot is None:
+            snapshot = Snapshot(time.time(), rollup_analytics(self.pool.connection(), days))
+            with self._lock:
+                if days not in self._windows and len(self._windows) < self.max_windows:
+                    self._windows.append(days)
+                if days in self._windows:
+                    self._snapshots = {**self._snapshots, days: snapshot}
+        return {
+            **snapshot.data,
+            "generated_at": datetime.fromtimestamp(snapshot.generated_at, timezone.utc).isoformat(),
+            "age_seconds": round(time.time() - snapshot.generated_at, 3),
+        }
+
+
+_aggregators: Dict[str, AnalyticsAggregator] = {}
+_aggregators_lock = threading.Lock()
+
+
+def get_aggregator(db_path: str) -> AnalyticsAggregator:
+    key = os.path.abspath(db_path)
+    with _aggregators_lock:
+        aggregator = _aggregators.get(key)
+        if aggregator is None:
+            aggregator = _aggregators[key] = AnalyticsAggregator(get_pool(db_path))
+    return aggregator
@@ -0,0 +1,24 @@
+from functools import partial
+
+from anyio import CapacityLimiter, to_thread
+
+import config
+
+_limiter = None
+
+
+def _get_limiter():
+    # Created on first use: anyio limiters need a running event loop
+    global _limiter
+    if _limiter is None:
+        _limiter = CapacityLimiter(config.BLOCKING_WORKERS)
+    return _limiter
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run blocking SQLite or scoring work on a worker thread so the event loop stays free.
+
+    At most BLOCKING_WORKERS calls run at once; the rest wait without holding a
+    thread, which bounds both the threads and the pooled connections they open.
+    """
+    return await to_thread.run_sync(partial(func, *args, **kwargs), limiter=_get_limiter())
@@ -0,0 +1,102 @@
+import os
+
+# Matching engine settings, overridable through the environment.
+
+# Number of BM25 candidates handed to the rapidfuzz scorers. Knowledge bases no
+# larger than this are scored in full; 0 disables the shortlist entirely.
+BM25_SHORTLIST_SIZE = int(os.getenv("HELPBOT_BM25_SHORTLIST_SIZE", "200"))
+
+# Threads rapidfuzz may use for batch scoring (-1 uses every core).
+SCORING_WORKERS = int(os.getenv("HELPBOT_SCORING_WORKERS", "1"))
+
+# Engine behind /chatbot/suggest: "fuzzy" (BM25 shortlist + rapidfuzz) or "tfidf".
+SUGGEST_ENGINE = os.getenv("HELPBOT_SUGGEST_ENGINE", "fuzzy")
+
+# TF-IDF engine: number of results kept and minimum cosine similarity (0-1).
+TFIDF_TOP_K = int(os.getenv("HELPBOT_TFIDF_TOP_K", "100"))
+TFIDF_MIN_SIMILARITY = float(os.getenv("HELPBOT_TFIDF_MIN_SIMILARITY", "0.2"))
+
+# Per-index cache of match results, keyed on the preprocessed query. Entries are
+# dropped when the questions table changes; a size of 0 disables the cache.
+RESULT_CACHE_SIZE = int(os.getenv("HELPBOT_RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("HELPBOT_RESULT_CACHE_TTL", "300"))
+
+# Bounded memo tables for stemming (word -> stem) and preprocessing (text -> tokens).
+STEM_CACHE_SIZE = int(os.getenv("HELPBOT_STEM_CACHE_SIZE", "100000"))
+TOKEN_CACHE_SIZE = int(os.getenv("HELPBOT_TOKEN_CACHE_SIZE", "10000"))
+
+# Query-side preprocessing of the advanced bot: "pos" runs the NLTK tagger (memoised
+# per input), "heuristic" keeps every non-stopword longer than two letters instead.
+# Questions are always POS filtered, once, when the index is built.
+QUERY_PREPROCESSING = os.getenv("HELPBOT_QUERY_PREPROCESSING", "pos")
+
+# Directory searched first for NLTK data; fill it with `python -m search.nltk_resources`.
+NLTK_DATA_DIR = os.getenv("HELPBOT_NLTK_DATA", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data"))
+
+# Typo-tolerant candidates from the character-trigram MinHash/LSH index, added to
+# the BM25 shortlist (0 disables), and the minimum estimated word similarity.
+MINHASH_CANDIDATES = int(os.getenv("HELPBOT_MINHASH_CANDIDATES", "50"))
+MINHASH_THRESHOLD = float(os.getenv("HELPBOT_MINHASH_THRESHOLD", "0.5"))
+
+# Spelling correction of /chatbot/suggest queries against the knowledge-base
+# vocabulary, preferring words typed at least SPELLING_MIN_QUERY_COUNT times
+# among the latest SPELLING_QUERY_LOG_ROWS queries. Off until measured on real traffic.
+SPELLING_CORRECTION = os.getenv("HELPBOT_SPELLING_CORRECTION", "0") == "1"
+SPELLING_MAX_EDIT_DISTANCE = int(os.getenv("HELPBOT_SPELLING_MAX_EDIT_DISTANCE", "2"))
+SPELLING_MIN_QUERY_COUNT = int(os.getenv("HELPBOT_SPELLING_MIN_QUERY_COUNT", "3"))
+SPELLING_QUERY_LOG_ROWS = int(os.getenv("HELPBOT_SPELLING_QUERY_LOG_ROWS", "10000"))
+
+# /chatbot/autocomplete: most results per prefix and how often a background job
+# rebuilds the in-memory index from the knowledge-base snapshot to pick up new
+# questions and query_log popularity (0 builds it once).
+AUTOCOMPLETE_MAX_RESULTS = int(os.getenv("HELPBOT_AUTOCOMPLETE_MAX_RESULTS", "10"))
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv("HELPBOT_AUTOCOMPLETE_REFRESH_SECONDS", "60"))
+
+# Advanced bot: score one shard per question category, only the categories the
+# query hints at, and the shards concurrently on up to SHARD_WORKERS threads.
+SHARDED_MATCHING = os.getenv("HELPBOT_SHARDED_MATCHING", "1") == "1"
+SHARD_WORKERS = int(os.getenv("HELPBOT_SHARD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Advanced bot: score the full corpus on this many worker processes reading it from
+# shared memory instead of the BM25 shortlist (0 disables), and the smallest slice
+# of questions handed to one worker.
+MATCHING_PROCESSES = int(os.getenv("HELPBOT_MATCHING_PROCESSES", "0"))
+MATCHING_CHUNK_SIZE = int(os.getenv("HELPBOT_MATCHING_CHUNK_SIZE", "2000"))
+
+# SQLite connection pool: page cache per connection (KiB) and how long a
+# connection waits on a lock held by another writer (ms).
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("HELPBOT_SQLITE_CACHE_SIZE_KIB", "16384"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("HELPBOT_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Worker threads the async routes hand blocking database and scoring work to.
+BLOCKING_WORKERS = int(os.getenv("HELPBOT_BLOCKING_WORKERS", "16"))
+
+# Write-behind for query logs, feedback and view counts: commit them from a
+# background thread in batches of up to WRITE_BATCH_SIZE statements every
+# WRITE_FLUSH_INTERVAL_MS; producers wait once WRITE_QUEUE_SIZE are pending.
+WRITE_BEHIND = os.getenv("HELPBOT_WRITE_BEHIND", "1") == "1"
+WRITE_FLUSH_INTERVAL_MS = float(os.getenv("HELPBOT_WRITE_FLUSH_INTERVAL_MS", "50"))
+WRITE_BATCH_SIZE = int(os.getenv("HELPBOT_WRITE_BATCH_SIZE", "500"))
+WRITE_QUEUE_SIZE = int(os.getenv("HELPBOT_WRITE_QUEUE_SIZE", "10000"))
+
+# Seconds between the advanced bot's bulk recomputations of its incrementally
+# maintained feedback averages from the feedback table (0 disables).
+FEEDBACK_RECONCILE_SECONDS = float(os.getenv("HELPBOT_FEEDBACK_RECONCILE_SECONDS", "3600"))
+
+# Retention of raw query_log rows and of the daily analytics rollups, in days
+# (0 keeps them forever), and how often the pruning job runs.
+QUERY_LOG_RETENTION_DAYS = int(os.getenv("HELPBOT_QUERY_LOG_RETENTION_DAYS", "0"))
+ROLLUP_RETENTION_DAYS = int(os.getenv("HELPBOT_ROLLUP_RETENTION_DAYS", "730"))
+RETENTION_JOB_SECONDS = float(os.getenv("HELPBOT_RETENTION_JOB_SECONDS", "3600"))
+
+# /chatbot/analytics: windows (days) kept precomputed in memory, how often they
+# are refreshed from the daily rollups, and the longest window served.
+ANALYTICS_WINDOWS = [int(days) for days in os.getenv("HELPBOT_ANALYTICS_WINDOWS", "7,30,90").split(",")]
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("HELPBOT_ANALYTICS_REFRESH_SECONDS", "10"))
+ANALYTICS_MAX_DAYS = int(os.getenv("HELPBOT_ANALYTICS_MAX_DAYS", "365"))
+
+# In-memory knowledge-base snapshot: seconds between background checks of
+# kb_version and the question counters (0 reloads on every read instead), and
+# how many of the top questions it keeps ranked.
+KB_RELOAD_SECONDS = float(os.getenv("HELPBOT_KB_RELOAD_SECONDS", "2"))
+TOP_QUESTIONS_SNAPSHOT_SIZE = int(os.getenv("HELPBOT_TOP_QUESTIONS_SNAPSHOT_SIZE", "50"))
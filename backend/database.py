@@ -1,76 +1,551 @@
 import sqlite3
 import os
-import csv
+import threading
+import weakref
+
+import config
 
 DATABASE_URL = "./helpbot.db"
 
-def init_db():
-    conn = sqlite3.connect(DATABASE_URL)
-    c = conn.cursor()
-
-    # Drop existing tables (for POC simplicity, in production you might migrate)
-    c.execute("DROP TABLE IF EXISTS questions")
-    c.execute("DROP TABLE IF EXISTS feedback")
-    c.execute("DROP TABLE IF EXISTS query_log")
-
-    # Create tables
-    c.execute("""
-        CREATE TABLE questions (
-            id INTEGER PRIMARY KEY,
-            question TEXT,
-            answer TEXT,
-            article_link TEXT,
-            tags TEXT,
-            feedback INTEGER
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_name TEXT,
-            question_id INTEGER,
-            feedback_score INTEGER,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
+# Bumped by triggers whenever the questions table changes so in-process
+# indexes know when to refresh without re-reading the whole table.
+KB_VERSION_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS kb_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO kb_version (id, version) VALUES (1, 0);
+    CREATE TRIGGER IF NOT EXISTS questions_version_insert AFTER INSERT ON questions
+    BEGIN
+        UPDATE kb_version SET version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS questions_version_update AFTER UPDATE ON questions
+    BEGIN
+        UPDATE kb_version SET version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS questions_version_delete AFTER DELETE ON questions
+    BEGIN
+        UPDATE kb_version SET version = version + 1 WHERE id = 1;
+    END;
+"""
+
+# Per-question counters kept current by triggers as events are logged, so
+# popularity rankings never aggregate over the whole query_log.
+QUESTION_STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS question_stats (
+        question_id INTEGER PRIMARY KEY,
+        query_count INTEGER NOT NULL DEFAULT 0,
+        view_count INTEGER NOT NULL DEFAULT 0,
+        feedback_sum REAL NOT NULL DEFAULT 0,
+        feedback_count INTEGER NOT NULL DEFAULT 0
+    );
+"""
+
+QUESTION_STATS_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS query_log_stats AFTER INSERT ON query_log
+    WHEN NEW.matched_question_id IS NOT NULL
+    BEGIN
+        INSERT INTO question_stats (question_id, query_count) VALUES (NEW.matched_question_id, 1)
+        ON CONFLICT (question_id) DO UPDATE SET query_count = query_count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS feedback_stats AFTER INSERT ON feedback
+    WHEN NEW.question_id IS NOT NULL AND NEW.feedback_score IS NOT NULL
+    BEGIN
+        INSERT INTO question_stats (question_id, feedback_sum, feedback_count)
+        VALUES (NEW.question_id, NEW.feedback_score, 1)
+        ON CONFLICT (question_id) DO UPDATE SET
+            feedback_sum = feedback_sum + NEW.feedback_score,
+            feedback_count = feedback_count + 1;
+    END;
+"""
+
+INCREMENT_VIEW_COUNT = """
+    INSERT INTO question_stats (question_id, view_count) VALUES (?, 1)
+    ON CONFLICT (question_id) DO UPDATE SET view_count = view_count + 1
+"""
+
+def get_kb_version(conn):
+    row = conn.execute("SELECT version FROM kb_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+def top_questions(conn, limit=5):
+    """Most asked questions as dicts, ties broken by feedback then views.
+
+    view_count and query_count are the live question_stats counters.
+    """
+    rows = conn.execute("""
+        SELECT q.*, COALESCE(s.query_count, 0) AS query_count,
+               COALESCE(s.view_count, 0) AS views
+        FROM questions q
+        LEFT JOIN question_stats s ON s.question_id = q.id
+        ORDER BY query_count DESC, q.feedback DESC, views DESC, q.id
+        LIMIT ?
+    """, (limit,)).fetchall()
+    questions = []
+    for row in rows:
+        question = dict(row)
+        question["view_count"] = question.pop("views")
+        questions.append(question)
+    return questions
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _has_table(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+# --- Migrations ---------------------------------------------------------------
+# The schema version is PRAGMA user_version. Each migration returns the SQL that
+# takes the database from the previous version to its own, given the current
+# state, and runs in a single transaction together with the version bump.
+
+# Union of the simple bot's and the advanced bot's schemas
+TABLES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY,
+        question TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        tags TEXT,
+        category TEXT,
+        difficulty_level INTEGER DEFAULT 1,
+        article_link TEXT,
+        feedback REAL DEFAULT 0.0,
+        view_count INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS query_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_name TEXT,
+        session_id TEXT,
+        raw_query TEXT,
+        processed_query TEXT,
+        matched_question_id INTEGER,
+        confidence_score REAL,
+        response_type TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (matched_question_id) REFERENCES questions (id)
+    );
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_name TEXT,
+        session_id TEXT,
+        question_id INTEGER,
+        feedback_score INTEGER,
+        feedback_text TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (question_id) REFERENCES questions (id)
+    );
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        session_id TEXT PRIMARY KEY,
+        user_name TEXT,
+        last_query TEXT,
+        last_results TEXT,
+        current_page INTEGER DEFAULT 1,
+        total_pages INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS escalations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT,
+        user_name TEXT,
+        reason TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+# Columns of the unified schema that tables created by the simple bot lack.
+# ALTER TABLE only takes constant defaults, so timestamps added here are NULL.
+UPGRADE_COLUMNS = {
+    "questions": [
+        ("category", "TEXT"),
+        ("difficulty_level", "INTEGER DEFAULT 1"),
+        ("view_count", "INTEGER DEFAULT 0"),
+        ("created_at", "TIMESTAMP"),
+        ("updated_at", "TIMESTAMP"),
+    ],
+    "query_log": [
+        ("session_id", "TEXT"),
+        ("processed_query", "TEXT"),
+        ("confidence_score", "REAL"),
+        ("response_type", "TEXT"),
+    ],
+    "feedback": [
+        ("session_id", "TEXT"),
+        ("feedback_text", "TEXT"),
+    ],
+}
+
+def _unify_schema(conn):
+    """v1: both bots' tables, kb_version and a backfilled question_stats"""
+    script = []
+    for table, columns in UPGRADE_COLUMNS.items():
+        if _has_table(conn, table):
+            existing = _columns(conn, table)
+            script += [f"ALTER TABLE {table} ADD COLUMN {name} {definition};"
+                       for name, definition in columns if name not in existing]
+    script += [TABLES_SCHEMA, KB_VERSION_SCHEMA]
+    if not _has_table(conn, "question_stats"):
+        views = "view_count" if "view_count" in _columns(conn, "questions") else "0"
+        script += [QUESTION_STATS_TABLE, f"""
+            INSERT INTO question_stats (question_id, view_count)
+                SELECT id, COALESCE({views}, 0) FROM questions;
+            INSERT INTO question_stats (question_id, query_count)
+                SELECT matched_question_id, COUNT(*) FROM query_log
+                WHERE matched_question_id IS NOT NULL GROUP BY matched_question_id
+                ON CONFLICT (question_id) DO UPDATE SET query_count = excluded.query_count;
+            INSERT INTO question_stats (question_id, feedback_sum, feedback_count)
+                SELECT question_id, SUM(feedback_score), COUNT(*) FROM feedback
+                WHERE question_id IS NOT NULL AND feedback_score IS NOT NULL GROUP BY question_id
+                ON CONFLICT (question_id) DO UPDATE SET
+                    feedback_sum = excluded.feedback_sum, feedback_count = excluded.feedback_count;
+        """]
+    script.append(QUESTION_STATS_TRIGGERS)
+    return "\n".join(script)
+
+def _add_indexes(conn):
+    """v2: covering indexes for the per-session, per-question and time-window queries"""
+    return """
+        -- session history suggestions: session_id = ? AND timestamp > ?, and NOT IN (...)
+        CREATE INDEX IF NOT EXISTS idx_query_log_session
+            ON query_log (session_id, timestamp, matched_question_id);
+        -- analytics windows: timestamp > ?, aggregating the remaining columns
+        CREATE INDEX IF NOT EXISTS idx_query_log_timestamp
+            ON query_log (timestamp, matched_question_id, confidence_score, session_id);
+        CREATE INDEX IF NOT EXISTS idx_query_log_question
+            ON query_log (matched_question_id);
+        -- per-question feedback averages and feedback windows
+        CREATE INDEX IF NOT EXISTS idx_feedback_question
+            ON feedback (question_id, feedback_score);
+        CREATE INDEX IF NOT EXISTS idx_feedback_timestamp
+            ON feedback (timestamp, feedback_score);
+        -- category suggestions, best rated first
+        CREATE INDEX IF NOT EXISTS idx_questions_category
+            ON questions (category, feedback DESC, view_count DESC);
     """
-    )
 
-    c.execute("""
-        CREATE TABLE query_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_name TEXT,
-            raw_query TEXT,
-            matched_question_id INTEGER,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
+def _content_version_trigger(conn):
+    """v3: only changes to matched or displayed text bump kb_version, not counters"""
+    return """
+        DROP TRIGGER IF EXISTS questions_version_update;
+        CREATE TRIGGER questions_version_update
+        AFTER UPDATE OF id, question, answer, tags, category, article_link ON questions
+        BEGIN
+            UPDATE kb_version SET version = version + 1 WHERE id = 1;
+        END;
     """
+
+def _feedback_version_trigger(conn):
+    """v5: feedback averages order matches and top questions, so they bump kb_version too"""
+    return """
+        DROP TRIGGER IF EXISTS questions_version_update;
+        CREATE TRIGGER questions_version_update
+        AFTER UPDATE OF id, question, answer, tags, category, article_link, feedback ON questions
+        BEGIN
+            UPDATE kb_version SET version = version + 1 WHERE id = 1;
+        END;
+    """
+
+def _category_index(conn):
+    """v6: category suggestions index without questions.view_count, which views no longer update"""
+    return """
+        DROP INDEX IF EXISTS idx_questions_category;
+        CREATE INDEX idx_questions_category ON questions (category, feedback DESC);
+    """
+
+def _backfill_feedback(conn):
+    """v7: questions imported with an empty feedback cell get the column default"""
+    return "UPDATE questions SET feedback = 0.0 WHERE feedback IS NULL;"
+
+def _feedback_out_of_kb_version(conn):
+    """v8: feedback averages reach readers through the snapshot counters, so
+    v5 is undone and only text changes bump kb_version again"""
+    return _content_version_trigger(conn)
+
+# Per-day aggregates of query_log and feedback, kept current by triggers so
+# analytics windows never scan the raw tables (which retention may prune).
+DAILY_ROLLUP_TABLES = """
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        day TEXT PRIMARY KEY,
+        queries INTEGER NOT NULL DEFAULT 0,
+        confidence_sum REAL NOT NULL DEFAULT 0,
+        confidence_count INTEGER NOT NULL DEFAULT 0,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        feedback_sum REAL NOT NULL DEFAULT 0,
+        feedback_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS daily_question_stats (
+        day TEXT NOT NULL,
+        question_id INTEGER NOT NULL,
+        queries INTEGER NOT NULL DEFAULT 0,
+        confidence_sum REAL NOT NULL DEFAULT 0,
+        feedback_sum REAL NOT NULL DEFAULT 0,
+        feedback_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, question_id)
+    ) WITHOUT ROWID;
+    -- Sessions seen per day, so unique sessions over a window stay exact
+    CREATE TABLE IF NOT EXISTS daily_sessions (
+        day TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        PRIMARY KEY (day, session_id)
+    ) WITHOUT ROWID;
+"""
+
+DAILY_ROLLUP_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS query_log_rollup AFTER INSERT ON query_log
+    BEGIN
+        INSERT INTO daily_stats (day, queries, confidence_sum, confidence_count)
+        VALUES (date(COALESCE(NEW.timestamp, 'now')), 1, COALESCE(NEW.confidence_score, 0),
+                NEW.confidence_score IS NOT NULL)
+        ON CONFLICT (day) DO UPDATE SET
+            queries = queries + 1,
+            confidence_sum = confidence_sum + excluded.confidence_sum,
+            confidence_count = confidence_count + excluded.confidence_count;
+        INSERT OR IGNORE INTO daily_sessions (day, session_id)
+            SELECT date(COALESCE(NEW.timestamp, 'now')), NEW.session_id
+            WHERE NEW.session_id IS NOT NULL;
+        INSERT INTO daily_question_stats (day, question_id, queries, confidence_sum)
+            SELECT date(COALESCE(NEW.timestamp, 'now')), NEW.matched_question_id, 1,
+                   COALESCE(NEW.confidence_score, 0)
+            WHERE NEW.matched_question_id IS NOT NULL
+        ON CONFLICT (day, question_id) DO UPDATE SET
+            queries = queries + 1,
+            confidence_sum = confidence_sum + excluded.confidence_sum;
+    END;
+    CREATE TRIGGER IF NOT EXISTS daily_sessions_rollup AFTER INSERT ON daily_sessions
+    BEGIN
+        UPDATE daily_stats SET sessions = sessions + 1 WHERE day = NEW.day;
+    END;
+    CREATE TRIGGER IF NOT EXISTS feedback_rollup AFTER INSERT ON feedback
+    WHEN NEW.feedback_score IS NOT NULL
+    BEGIN
+        INSERT INTO daily_stats (day, feedback_sum, feedback_count)
+        VALUES (date(COALESCE(NEW.timestamp, 'now')), NEW.feedback_score, 1)
+        ON CONFLICT (day) DO UPDATE SET
+            feedback_sum = feedback_sum + excluded.feedback_sum,
+            feedback_count = feedback_count + 1;
+        INSERT INTO daily_question_stats (day, question_id, feedback_sum, feedback_count)
+            SELECT date(COALESCE(NEW.timestamp, 'now')), NEW.question_id, NEW.feedback_score, 1
+            WHERE NEW.question_id IS NOT NULL
+        ON CONFLICT (day, question_id) DO UPDATE SET
+            feedback_sum = feedback_sum + excluded.feedback_sum,
+            feedback_count = feedback_count + 1;
+    END;
+"""
+
+def _daily_rollups(conn):
+    """v4: daily rollups of query_log and feedback, backfilled from existing rows"""
+    return DAILY_ROLLUP_TABLES + """
+        INSERT INTO daily_sessions (day, session_id)
+            SELECT DISTINCT date(timestamp), session_id FROM query_log
+            WHERE session_id IS NOT NULL AND timestamp IS NOT NULL;
+        INSERT INTO daily_stats (day, queries, confidence_sum, confidence_count, sessions)
+            SELECT date(timestamp), COUNT(*), COALESCE(SUM(confidence_score), 0),
+                   COUNT(confidence_score), COUNT(DISTINCT session_id)
+            FROM query_log WHERE timestamp IS NOT NULL GROUP BY date(timestamp);
+        INSERT INTO daily_stats (day, feedback_sum, feedback_count)
+            SELECT date(timestamp), SUM(feedback_score), COUNT(*) FROM feedback
+            WHERE timestamp IS NOT NULL AND feedback_score IS NOT NULL GROUP BY date(timestamp)
+            ON CONFLICT (day) DO UPDATE SET
+                feedback_sum = excluded.feedback_sum, feedback_count = excluded.feedback_count;
+        INSERT INTO daily_question_stats (day, question_id, queries, confidence_sum)
+            SELECT date(timestamp), matched_question_id, COUNT(*), COALESCE(SUM(confidence_score), 0)
+            FROM query_log WHERE timestamp IS NOT NULL AND matched_question_id IS NOT NULL
+            GROUP BY date(timestamp), matched_question_id;
+        INSERT INTO daily_question_stats (day, question_id, feedback_sum, feedback_count)
+            SELECT date(timestamp), question_id, SUM(feedback_score), COUNT(*) FROM feedback
+            WHERE timestamp IS NOT NULL AND question_id IS NOT NULL AND feedback_score IS NOT NULL
+            GROUP BY date(timestamp), question_id
+            ON CONFLICT (day, question_id) DO UPDATE SET
+                feedback_sum = excluded.feedback_sum, feedback_count = excluded.feedback_count;
+    """ + DAILY_ROLLUP_TRIGGERS
+
+MIGRATIONS = [
+    (1, _unify_schema),
+    (2, _add_indexes),
+    (3, _content_version_trigger),
+    (4, _daily_rollups),
+    (5, _feedback_version_trigger),
+    (6, _category_index),
+    (7, _backfill_feedback),
+    (8, _feedback_out_of_kb_version),
+]
+
+# Average of a question's votes, O(1) from the counters the feedback trigger keeps
+UPDATE_FEEDBACK_AVERAGE = """
+    UPDATE questions SET feedback = (
+        SELECT feedback_sum * 1.0 / feedback_count FROM question_stats
+        WHERE question_id = ? AND feedback_count > 0
     )
+    WHERE id = ? AND EXISTS (
+        SELECT 1 FROM question_stats WHERE question_id = ? AND feedback_count > 0
+    )
+"""
+
+def reconcile_feedback(conn):
+    """Recompute every question's feedback counters and average from the feedback table.
+
+    Corrects any drift in the incrementally maintained values; returns the number
+    of questions whose average changed. Like every feedback update, the new
+    averages reach readers with the knowledge-base snapshot's next counter read.
+    """
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("""
+            INSERT INTO question_stats (question_id, feedback_sum, feedback_count)
+                SELECT question_id, SUM(feedback_score), COUNT(*) FROM feedback
+                WHERE question_id IS NOT NULL AND feedback_score IS NOT NULL GROUP BY question_id
+                ON CONFLICT (question_id) DO UPDATE SET
+                    feedback_sum = excluded.feedback_sum, feedback_count = excluded.feedback_count
+                WHERE feedback_sum IS NOT excluded.feedback_sum
+                   OR feedback_count IS NOT excluded.feedback_count
+        """)
+        conn.execute("""
+            UPDATE question_stats SET feedback_sum = 0, feedback_count = 0
+            WHERE feedback_count != 0 AND question_id NOT IN (
+                SELECT question_id FROM feedback WHERE question_id IS NOT NULL
+            )
+        """)
+        changed = conn.execute("""
+            UPDATE questions SET feedback = s.feedback_sum * 1.0 / s.feedback_count
+            FROM question_stats s
+            WHERE s.question_id = questions.id AND s.feedback_count > 0
+              AND questions.feedback IS NOT s.feedback_sum * 1.0 / s.feedback_count
+        """).rowcount
+    return changed
+
+def rollup_analytics(conn, days=7):
+    """Query, top-question and feedback statistics for the last `days` days, from the rollups.
+
+    Windows are whole UTC days, today included, and cost a read of at most `days`
+    rollup rows (plus that window's per-question and session rows), whatever
+    the size of query_log.
+    """
+    since = (f"-{int(days) - 1} days",)
+    totals = conn.execute("""
+        SELECT COALESCE(SUM(queries), 0) AS total_queries,
+               SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0) AS avg_confidence,
+               SUM(feedback_sum) / NULLIF(SUM(feedback_count), 0) AS avg_feedback,
+               COALESCE(SUM(feedback_count), 0) AS total_feedback
+        FROM daily_stats WHERE day >= date('now', ?)
+    """, since).fetchone()
+    unique_sessions = conn.execute(
+        "SELECT COUNT(DISTINCT session_id) FROM daily_sessions WHERE day >= date('now', ?)", since
+    ).fetchone()[0]
+    top_questions = conn.execute("""
+        SELECT q.question, t.query_count
+        FROM (
+            SELECT question_id, SUM(queries) AS query_count FROM daily_question_stats
+            WHERE day >= date('now', ?) GROUP BY question_id
+        ) t
+        JOIN questions q ON q.id = t.question_id
+        WHERE t.query_count > 0
+        ORDER BY t.query_count DESC
+        LIMIT 10
+    """, since).fetchall()
+    return {
+        "query_statistics": {
+            "total_queries": totals[0],
+            "avg_confidence": totals[1],
+            "unique_sessions": unique_sessions,
+        },
+        "top_questions": [{"question": row[0], "query_count": row[1]} for row in top_questions],
+        "feedback_statistics": {"avg_feedback": totals[2], "total_feedback": totals[3]},
+        "period_days": days,
+    }
+
+def prune_raw_logs(conn, retention_days=config.QUERY_LOG_RETENTION_DAYS,
+                   rollup_retention_days=config.ROLLUP_RETENTION_DAYS, batch_size=10000):
+    """Delete query_log rows past retention, in small batches so writers are not blocked long.
+
+    Counters in question_stats and the daily rollups are unaffected; rollups have
+    their own, longer, retention. 0 keeps rows forever. Returns query_log rows deleted.
+    """
+    deleted = 0
+    if retention_days > 0:
+        cutoff = (f"-{int(retention_days)} days",)
+        while True:
+            with conn:
+                count = conn.execute("""
+                    DELETE FROM query_log WHERE id IN (
+                        SELECT id FROM query_log WHERE timestamp < datetime('now', ?) LIMIT ?
+                    )
+                """, cutoff + (batch_size,)).rowcount
+            deleted += count
+            if count < batch_size:
+                break
+    if rollup_retention_days > 0:
+        cutoff = (f"-{int(rollup_retention_days)} days",)
+        with conn:
+            for table in ("daily_stats", "daily_question_stats", "daily_sessions"):
+                conn.execute(f"DELETE FROM {table} WHERE day < date('now', ?)", cutoff)
+    return deleted
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _statements(script):
+    """The SQL statements of a script, trigger bodies kept whole"""
+    start = 0
+    for end, char in enumerate(script):
+        if char == ";" and sqlite3.complete_statement(script[start:end + 1]):
+            yield script[start:end + 1]
+            start = end + 1
+
+def migrate(conn):
+    """Upgrade the database in place to the latest schema version, returns the versions applied.
+
+    Several workers may start on the same old database at once, so each step
+    takes the write lock (BEGIN IMMEDIATE) before it reads the schema it builds
+    its script from; a worker that waited finds the step done and skips it.
+    """
+    applied = []
+    if conn.in_transaction:
+        conn.commit()
+    for version, migration in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version > schema_version(conn):
+                for statement in _statements(migration(conn)):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+                applied.append(version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+def explain_query_plan(conn, sql, params=()):
+    """SQLite's plan for a query, one detail line per step, e.g. to assert an index is used:
 
-    # Load data from CSV (assuming data.csv is in the workspace root)
+        any("USING COVERING INDEX idx_feedback_question" in step
+            for step in explain_query_plan(conn, sql, params))
+    """
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def init_db():
+    conn = sqlite3.connect(DATABASE_URL)
+    migrate(conn)
+
+    # Load data from CSV (assuming data.csv is in the workspace root). Rows are
+    # upserted by id, so loading again refreshes questions but keeps the logs.
     data_csv_path = "data.csv"
     if not os.path.exists(data_csv_path):
         print(f"Warning: {data_csv_path} not found. Cannot load initial data.")
     else:
-        with open(data_csv_path, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    c.execute("""
-                        INSERT INTO questions (id, question, answer, article_link, tags, feedback)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (
-                        int(row["id"]),
-                        row["question"],
-                        row["answer"],
-                        row["article_link"],
-                        row["tags"],
-                        int(row["feedback"])
-                    ))
-                except ValueError as e:
-                    print(f"Skipping row due to data error: {row} - {e}")
-
-    conn.commit()
+        from importer import import_questions  # the importer builds on this module
+        result = import_questions(conn, data_csv_path)
+        for error in result.errors:
+            print(f"Skipping row due to data error: {error}")
+        print(result)
+
     conn.close()
 
 def init_db_if_not_exists():
@@ -82,11 +557,102 @@ def init_db_if_not_exists():
         except Exception as e:
             print(f"Error during database initialization: {e}")
             # Depending on severity, you might want to sys.exit(1) here
-
-def get_db():
+        return
     conn = sqlite3.connect(DATABASE_URL)
-    conn.row_factory = sqlite3.Row # Allows accessing columns by name
     try:
-        yield conn
+        applied = migrate(conn)
+        if applied:
+            print(f"Database migrated to schema version {applied[-1]}.")
     finally:
-        conn.close() 
\ No newline at end of file
+        conn.close()
+
+class _ThreadConnection:
+    """Holds a thread's connection in its thread-local slot; dropped when the thread exits"""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+class ConnectionPool:
+    """One configured connection per thread, opened on first use and kept for the
+    life of the thread, so requests never pay for connection setup. Worker threads
+    come and go (anyio retires idle ones), so a connection is closed as soon as
+    its thread exits instead of piling up in the pool.
+
+    WAL mode lets readers proceed while a writer is committing, and
+    synchronous=NORMAL only fsyncs at checkpoints instead of every commit.
+    """
+
+    def __init__(self, path, cache_size_kib=config.SQLITE_CACHE_SIZE_KIB,
+                 busy_timeout_ms=config.SQLITE_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def __len__(self):
+        """Connections currently open"""
+        return len(self._connections)
+
+    def connection(self):
+        """The calling thread's connection"""
+        held = getattr(self._local, "held", None)
+        if held is None:
+            conn = self._open()
+            with self._lock:
+                self._connections.add(conn)
+            held = self._local.held = _ThreadConnection(conn)
+            weakref.finalize(held, self._release, conn)
+        return held.conn
+
+    def _release(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+        conn.close()
+
+    def _open(self):
+        # Only the owning thread uses a connection; close_all may run on another
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=DATABASE_URL):
+    """Process-wide pool for a database file"""
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(path)
+            migrate(pool.connection())
+    return pool
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+async def get_db():
+    """FastAPI dependency: the pool of the app database.
+
+    The pool, not a connection, is injected because sync routes and async routes
+    run on different threads; each takes its own thread's connection from it.
+    """
+    return get_pool(DATABASE_URL)
@@ -0,0 +1,146 @@
+"""Streaming bulk import of knowledge-base questions from CSV.
+
+    python -m importer data.csv --db helpbot.db
+
+Rows are upserted by id in chunks of executemany inside a single transaction,
+with fsyncs turned off for the duration of the load. Unchanged rows are left
+alone, so re-importing a refreshed export only touches (and re-indexes) the
+questions that changed. Existing questions keep their live feedback average;
+the file's feedback only seeds new ones.
+"""
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from operator import itemgetter
+from typing import IO, Iterator, List, Sequence, Union
+
+import database
+
+# CSV columns loaded into questions; id and question are required
+COLUMNS = ("id", "question", "answer", "article_link", "tags", "category", "difficulty_level", "feedback")
+INTEGER_COLUMNS = {"id", "difficulty_level"}
+REAL_COLUMNS = {"feedback"}
+# Columns refreshed on existing questions
+UPDATE_COLUMNS = ("question", "answer", "article_link", "tags", "category", "difficulty_level")
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)  # first few skipped rows
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"Imported {self.rows} rows ({self.skipped} skipped) in {self.seconds:.2f} s, "
+                f"{self.rows_per_second:,.0f} rows/s")
+
+
+def _real(value: str) -> float:
+    # An empty cell takes the column default: NULL feedback would break ranking
+    return float(value) if value.strip() else 0.0
+
+
+def _rows(reader, header: Sequence[str], result: ImportResult) -> Iterator[list]:
+    names = [name for name in COLUMNS if name in header]
+    pick = itemgetter(*(header.index(name) for name in names))
+    # Only numeric columns need converting, text is passed through as read
+    converters = [
+        (position, int if name in INTEGER_COLUMNS else _real)
+        for position, name in enumerate(names)
+        if name in INTEGER_COLUMNS or name in REAL_COLUMNS
+    ]
+    width = len(header)
+    for line_number, row in enumerate(reader, start=2):
+        if len(row) != width:
+            result.skipped += 1
+            if len(result.errors) < 5:
+                result.errors.append(f"line {line_number}: expected {width} fields, got {len(row)}")
+            continue
+        values = list(pick(row))  # id and question are always picked, so a tuple
+        try:
+            for position, convert in converters:
+                values[position] = convert(values[position])
+        except ValueError as e:
+            result.skipped += 1
+            if len(result.errors) < 5:
+                result.errors.append(f"line {line_number}: {e}")
+            continue
+        yield values
+
+
+def _upsert_sql(names: Sequence[str]) -> str:
+    updates = [name for name in UPDATE_COLUMNS if name in names]
+    changed = " OR ".join(f"questions.{name} IS NOT excluded.{name}" for name in updates)
+    return f"""
+        INSERT INTO questions ({", ".join(names)}) VALUES ({", ".join("?" for _ in names)})
+        ON CONFLICT (id) DO UPDATE SET {", ".join(f"{name} = excluded.{name}" for name in updates)}
+        WHERE {changed}
+    """
+
+
+def import_questions(conn: sqlite3.Connection, source: Union[str, IO[str]],
+                     chunk_size: int = 10000) -> ImportResult:
+    """Upsert every question of a CSV file (path or open text file) into the database"""
+    if isinstance(source, str):
+        with open(source, newline="", encoding="utf-8") as f:
+            return import_questions(conn, f, chunk_size)
+
+    result = ImportResult()
+    started = time.perf_counter()
+    reader = csv.reader(source)
+    header = [name.strip() for name in next(reader, [])]
+    if "id" not in header or "question" not in header:
+        raise ValueError(f"CSV header must have id and question columns, got {header}")
+    names = [name for name in COLUMNS if name in header]
+    sql = _upsert_sql(names)
+    rows = _rows(reader, header, result)
+
+    database.migrate(conn)
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    try:
+        with conn:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                conn.executemany(sql, chunk)
+                result.rows += len(chunk)
+    finally:
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.execute(f"PRAGMA cache_size={cache_size}")
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import knowledge-base questions from CSV")
+    parser.add_argument("csv", help="CSV export with at least id and question columns")
+    parser.add_argument("--db", default=database.DATABASE_URL, help="SQLite database to load into")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows per executemany")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        result = import_questions(conn, args.csv, args.chunk_size)
+    finally:
+        conn.close()
+    for error in result.errors:
+        print(f"Skipped {error}", file=sys.stderr)
+    print(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
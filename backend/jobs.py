@@ -0,0 +1,41 @@
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """Runs func every interval seconds on a daemon thread until stopped.
+
+    A failing run is logged and retried at the next interval. An interval of 0
+    or less disables the job.
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable[[], object]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"helpbot-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self):
+        try:
+            return self.func()
+        except Exception as e:
+            logger.error(f"Job {self.name} failed: {e}")
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.run_once()
@@ -1,13 +1,62 @@
+import time
+
+# Import-to-ready latency is measured from here
+_started = time.perf_counter()
+
 import sqlite3
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers import chatbot
+from reference.chatbot import HelpBot
+from search.knowledge_base import close_knowledge_bases, get_knowledge_base
+from search.process_engine import close_process_pool
+import config
 import database
+from analytics import get_aggregator
+from jobs import PeriodicJob
+from write_behind import close_write_queues
+
+# Matching worker processes (search.process_engine) re-import the script that
+# started the server as __mp_main__; they skip the startup work
+_server = __name__ != "__mp_main__"
 
-# Initialize the database on startup
-database.init_db_if_not_exists()
+if _server:
+    # Initialize the database on startup
+    database.init_db_if_not_exists()
 
-app = FastAPI()
+    # Load the knowledge-base snapshot and build the question index up front so the
+    # first request doesn't pay for it; this also seeds the stem table with the
+    # knowledge-base vocabulary
+    HelpBot().warm_up()
+    get_knowledge_base(database.DATABASE_URL).autocomplete()
+
+@asynccontextmanager
+async def lifespan(app):
+    jobs = [
+        # Raw query_log rows past retention; analytics live on in the rollups
+        PeriodicJob(
+            "log-retention", config.RETENTION_JOB_SECONDS,
+            lambda: database.prune_raw_logs(database.get_pool().connection())
+        ),
+        # Snapshots served by /chatbot/analytics
+        PeriodicJob(
+            "analytics", config.ANALYTICS_REFRESH_SECONDS,
+            get_aggregator(database.DATABASE_URL).refresh
+        ),
+    ]
+    for job in jobs:
+        job.start()
+    yield
+    for job in jobs:
+        job.stop()
+    close_knowledge_bases()
+    close_process_pool()
+    # Commit queued log/feedback writes before the pooled connections go away
+    close_write_queues()
+    database.close_pools()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware
 origins = [
@@ -26,6 +75,10 @@ app.add_middleware(
 # Include routers
 app.include_router(chatbot.router)
 
+app.state.startup_seconds = time.perf_counter() - _started
+if _server:
+    print(f"Backend ready in {app.state.startup_seconds * 1000:.0f} ms")
+
 # This block is typically for running the script directly, which is not how
 # FastAPI is usually run with uvicorn. It's left here but the main way
 # to run the app is with `uvicorn main:app --reload`.
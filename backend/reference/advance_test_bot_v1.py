@@ -1,26 +1,31 @@
 import sqlite3
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.tag import pos_tag
 import re
-import nltk
-from rapidfuzz import fuzz, process
 import random
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Any
 from dataclasses import dataclass, asdict
 from enum import Enum
 # import json
 # import requests
 from collections import defaultdict, Counter
+from functools import lru_cache
+import config
+from database import (INCREMENT_VIEW_COUNT, UPDATE_FEEDBACK_AVERAGE, get_pool, migrate, reconcile_feedback,
+                      rollup_analytics)
+from jobs import PeriodicJob
+from search import nltk_resources
+from search.intents import PhraseMatcher
+from search.knowledge_base import get_knowledge_base
+from search.question_index import Candidates, QuestionIndex
+from search.ranking import RankedMatches
+from search.process_engine import SharedCorpus, score_shared
+from search.scoring import blended_scores
+from search.shards import ShardRouter, score_shards
+from search.stemming import stem
+from write_behind import write
 
-# Download required NLTK data
-nltk.download("stopwords", quiet=True)
-nltk.download("punkt", quiet=True)
-nltk.download("averaged_perceptron_tagger", quiet=True)
-nltk.download("wordnet", quiet=True)
+# NLTK data is provisioned ahead of time and loaded lazily, see search/nltk_resources.py
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -64,8 +69,9 @@ class AdvancedHelpBot:
     def __init__(self, db_path="helpbot.db"):
         self.db_path = db_path
         self.conn = None
-        self.stop_words = set(stopwords.words("english"))
-        self.stemmer = PorterStemmer()
+        self.stop_words = nltk_resources.stop_words()
+        self._preprocess_cached = lru_cache(maxsize=config.TOKEN_CACHE_SIZE)(self._preprocess_uncached)
+        self._preprocess_query_cached = lru_cache(maxsize=config.TOKEN_CACHE_SIZE)(self._preprocess_heuristic)
         self.user_sessions = {}
         self.rate_limits = defaultdict(list)
         
@@ -91,6 +97,22 @@ class AdvancedHelpBot:
             "bad", "terrible", "awful", "disappointed", "frustrated"
         }
         
+        self.filler_phrases = [
+            "i need help with", "i need help on", "please help", "can you help me with",
+            "how do i", "how to", "i want to", "tell me how to", "what is the way to"
+        ]
+        
+        # One compiled matcher for intent keywords (in priority order) and filler phrases
+        self.phrase_matcher = PhraseMatcher(
+            intents=[
+                ("greeting", self.greeting_keywords),
+                ("escalation", self.escalation_keywords),
+                ("help", self.help_keywords),
+                ("negative_feedback", self.negative_feedback_keywords),
+            ],
+            fillers=self.filler_phrases
+        )
+        
         # Response templates
         self.greetings = [
             "👋 Hey there! I'm here to help you find answers quickly.",
@@ -123,6 +145,14 @@ class AdvancedHelpBot:
         }
         
         self._init_database()
+        
+        # Exact feedback averages, correcting any drift of the incremental ones
+        # save_feedback keeps; runs on its own pooled connection
+        self._reconcile_job = PeriodicJob(
+            "feedback-reconcile", config.FEEDBACK_RECONCILE_SECONDS,
+            lambda: reconcile_feedback(get_pool(self.db_path).connection())
+        )
+        self._reconcile_job.start()
     
     def _init_database(self):
         """Initialize database connection with error handling"""
@@ -136,70 +166,8 @@ class AdvancedHelpBot:
             raise
     
     def _create_tables(self):
-        """Create necessary tables if they don't exist"""
-        cursor = self.conn.cursor()
-        
-        # Enhanced tables with new fields
-        cursor.executescript("""
-            CREATE TABLE IF NOT EXISTS questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question TEXT NOT NULL,
-                answer TEXT NOT NULL,
-                tags TEXT,
-                category TEXT,
-                difficulty_level INTEGER DEFAULT 1,
-                article_link TEXT,
-                feedback REAL DEFAULT 0.0,
-                view_count INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            
-            CREATE TABLE IF NOT EXISTS query_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_name TEXT,
-                session_id TEXT,
-                raw_query TEXT,
-                processed_query TEXT,
-                matched_question_id INTEGER,
-                confidence_score REAL,
-                response_type TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (matched_question_id) REFERENCES questions (id)
-            );
-            
-            CREATE TABLE IF NOT EXISTS feedback (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_name TEXT,
-                session_id TEXT,
-                question_id INTEGER,
-                feedback_score INTEGER,
-                feedback_text TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (question_id) REFERENCES questions (id)
-            );
-            
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                session_id TEXT PRIMARY KEY,
-                user_name TEXT,
-                last_query TEXT,
-                last_results TEXT,
-                current_page INTEGER DEFAULT 1,
-                total_pages INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            
-            CREATE TABLE IF NOT EXISTS escalations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT,
-                user_name TEXT,
-                reason TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-        self.conn.commit()
+        """Create the tables, or upgrade them in place, through the shared migrations"""
+        migrate(self.conn)
     
     def _check_rate_limit(self, user_identifier: str, limit: int = 10, window: int = 60) -> bool:
         """Check if user has exceeded rate limit"""
@@ -231,83 +199,161 @@ class AdvancedHelpBot:
         return True
     
     def preprocess_text(self, text: str) -> List[str]:
-        """Enhanced text preprocessing with NLP"""
+        """Enhanced text preprocessing with NLP, memoised per input text"""
         if not text:
             return []
-        
-        # Clean and normalize
+        return list(self._preprocess_cached(text))
+    
+    def preprocess_query(self, text: str) -> List[str]:
+        """Preprocess user input with the pipeline chosen by QUERY_PREPROCESSING"""
+        if config.QUERY_PREPROCESSING == "heuristic":
+            if not text:
+                return []
+            return list(self._preprocess_query_cached(text))
+        return self.preprocess_text(text)
+    
+    def _clean_text(self, text: str) -> str:
+        """Lower-case, drop punctuation and filler phrases"""
         text = re.sub(r'[^\w\s]', ' ', text.lower())
         text = re.sub(r'\s+', ' ', text.strip())
         
         # Remove filler phrases
-        filler_phrases = [
-            "i need help with", "i need help on", "please help", "can you help me with",
-            "how do i", "how to", "i want to", "tell me how to", "what is the way to"
-        ]
-        
-        for phrase in filler_phrases:
-            text = text.replace(phrase, "")
+        return self.phrase_matcher.scan(text).text
+    
+    def _stem_important(self, words: List[str]) -> Tuple[str, ...]:
+        """Filter stopwords and stem through the shared memo table"""
+        return tuple(
+            stem(word) for word in words
+            if word not in self.stop_words and len(word) > 2
+        )
+    
+    def _preprocess_uncached(self, text: str) -> Tuple[str, ...]:
+        """Tokenize, POS filter and stem one text"""
+        text = self._clean_text(text)
         
         # Tokenize and get POS tags
-        tokens = word_tokenize(text)
-        pos_tags = pos_tag(tokens)
+        tokens = nltk_resources.word_tokenize(text)
+        pos_tags = nltk_resources.pos_tag(tokens)
+        if pos_tags is None:  # Tagger not provisioned, fall back to the heuristic filter
+            return self._stem_important(tokens)
         
         # Keep important words (nouns, verbs, adjectives)
         important_pos = {'NN', 'NNS', 'NNP', 'NNPS', 'VB', 'VBD', 'VBG', 'VBN', 'VBP', 'VBZ', 'JJ', 'JJR', 'JJS'}
         important_words = [word for word, pos in pos_tags if pos in important_pos or len(word) > 3]
         
-        # Filter stopwords and stem
-        processed = [
-            self.stemmer.stem(word) for word in important_words
-            if word not in self.stop_words and len(word) > 2
-        ]
-        
-        return processed
+        return self._stem_important(important_words)
+    
+    def _preprocess_heuristic(self, text: str) -> Tuple[str, ...]:
+        """POS-free fast path: every non-stopword longer than two letters counts as important"""
+        # Punctuation is already gone, so whitespace splitting matches word_tokenize here;
+        # only three-letter words the tagger would have dropped survive this filter.
+        return self._stem_important(self._clean_text(text).split())
     
     def _detect_intent(self, text: str) -> str:
         """Detect user intent from text"""
-        text_lower = text.lower()
-        
-        if any(keyword in text_lower for keyword in self.greeting_keywords):
-            return "greeting"
-        elif any(keyword in text_lower for keyword in self.escalation_keywords):
-            return "escalation"
-        elif any(keyword in text_lower for keyword in self.help_keywords):
-            return "help"
-        elif any(keyword in text_lower for keyword in self.negative_feedback_keywords):
-            return "negative_feedback"
-        else:
-            return "question"
+        return self.phrase_matcher.scan(text.lower()).intent or "question"
+    
+    def _fuzzy_match_questions(self, user_input: str, index: QuestionIndex) -> RankedMatches:
+        """Enhanced fuzzy matching with multiple algorithms on the shortlisted questions"""
+        input_tokens = self.preprocess_query(user_input)
+        
+        # Repeated queries are served from the index's result cache. The key keeps the
+        # normalised raw text as well, since the partial_ratio component scores it directly.
+        cache_key = (" ".join(input_tokens), " ".join(user_input.lower().split()))
+        matches = index.cached(cache_key, lambda: tuple(self._score_index(user_input, input_tokens, index)))
+        
+        # Feedback averages and view counts move without a kb_version bump; the
+        # snapshot's copies break ties and replace the row's columns in the results
+        snapshot = get_knowledge_base(self.db_path).snapshot
+        view_counts = snapshot.view_counts
+        return RankedMatches(
+            matches,
+            key=lambda x: (-x[0], -(snapshot.feedback_of(x[1]) or 0), -view_counts.get(x[1]['id'], 0)),
+            value=lambda x: {**x[1], 'feedback': snapshot.feedback_of(x[1]),
+                             'view_count': view_counts.get(x[1]['id'], 0)}
+        )
     
-    def _fuzzy_match_questions(self, user_input: str, questions: List[Dict]) -> List[Tuple[float, Dict]]:
-        """Enhanced fuzzy matching with multiple algorithms"""
-        input_tokens = self.preprocess_text(user_input)
-        input_text = " ".join(input_tokens)
+    def _score_index(self, user_input: str, input_tokens: List[str],
+                     index: QuestionIndex) -> List[Tuple[float, Dict]]:
+        """Scores the whole index, or only the category shards the query is routed to"""
+        if not config.SHARDED_MATCHING:
+            if config.MATCHING_PROCESSES > 0:
+                shared = index.derived("shared_corpus", self._share_corpus)
+                return self._score_shared(user_input, input_tokens, *shared)
+            return self._score_candidates(
+                user_input, input_tokens, index.candidates(input_tokens, query_text=user_input)
+            )
         
+        if config.MATCHING_PROCESSES > 0:
+            shared_shards = index.derived("shared_shards", self._share_shards)
+            
+            def score(category):
+                if category not in shared_shards:
+                    return []
+                return self._score_shared(user_input, input_tokens, *shared_shards[category])
+        else:
+            def score(category):
+                candidates = index.shard_candidates(category, input_tokens, query_text=user_input)
+                return self._score_candidates(user_input, input_tokens, candidates)
+        
+        router = index.derived("shard_router", ShardRouter)
+        routed = router.route(input_tokens)
+        matches = score_shards(routed, score)
+        if not matches and len(routed) < len(router.categories):
+            # A hint that leads nowhere should not hide the other categories
+            others = [category for category in router.categories if category not in routed]
+            matches = score_shards(others, score)
+        return matches
+    
+    @staticmethod
+    def _share_corpus(entries) -> Tuple[Candidates, SharedCorpus]:
+        corpus = Candidates(entries, [e.tokens for e in entries],
+                            [e.row["question"].lower() for e in entries])
+        return corpus, SharedCorpus(corpus.tokens, corpus.questions)
+    
+    @classmethod
+    def _share_shards(cls, entries) -> Dict[Optional[str], Tuple[Candidates, SharedCorpus]]:
+        by_category = defaultdict(list)
+        for entry in entries:
+            by_category[entry.category].append(entry)
+        return {category: cls._share_corpus(group) for category, group in by_category.items()}
+    
+    def _score_shared(self, user_input: str, input_tokens: List[str], corpus: Candidates,
+                      shared: SharedCorpus) -> List[Tuple[float, Dict]]:
+        """Blended scores of a whole corpus, computed by the worker processes"""
+        # The exact word boost adds at most 20, so workers drop anything below 20
+        scored = score_shared(shared, " ".join(input_tokens), user_input.lower(), min_score=20)
+        return self._boosted_matches(input_tokens, corpus, scored)
+    
+    def _score_candidates(self, user_input: str, input_tokens: List[str],
+                          candidates: Candidates) -> List[Tuple[float, Dict]]:
+        """Blended scores of shortlisted candidates, keeping those above the threshold"""
+        # Weighted token_set/token_sort/partial blend, scored in native code
+        scores = blended_scores(" ".join(input_tokens), user_input.lower(),
+                                candidates.tokens, candidates.questions)
+        return self._boosted_matches(input_tokens, candidates, enumerate(scores))
+    
+    def _boosted_matches(self, input_tokens: List[str], candidates: Candidates,
+                         scored: Iterable[Tuple[int, float]]) -> List[Tuple[float, Dict]]:
+        """Adds the exact word boost to (position, blended score) pairs and applies the threshold"""
+        input_set = set(input_tokens)
         matches = []
         
-        for question in questions:
-            question_tokens = self.preprocess_text(f"{question['question']} {question.get('tags', '')}")
-            question_text = " ".join(question_tokens)
-            
-            # Multiple scoring methods
-            token_set_score = fuzz.token_set_ratio(input_text, question_text)
-            token_sort_score = fuzz.token_sort_ratio(input_text, question_text)
-            partial_score = fuzz.partial_ratio(user_input.lower(), question['question'].lower())
-            
-            # Weighted average
-            final_score = (token_set_score * 0.4 + token_sort_score * 0.4 + partial_score * 0.2)
+        for position, final_score in scored:
+            # The exact word boost adds at most 20, so lower scores can never reach the threshold
+            if final_score < 20:
+                continue
             
             # Boost score for exact word matches
-            common_words = set(input_tokens) & set(question_tokens)
+            common_words = input_set.intersection(candidates.tokens[position].split())
             if common_words:
                 boost = min(len(common_words) * 5, 20)
                 final_score += boost
             
             if final_score >= 40:  # Lower threshold for more matches
-                matches.append((final_score, question))
+                matches.append((final_score, dict(candidates.entries[position].row)))
         
-        return sorted(matches, key=lambda x: (-x[0], -x[1].get('feedback', 0), -x[1].get('view_count', 0)))
+        return matches
     
     def _get_suggestions_based_on_history(self, session_id: str) -> List[str]:
         """Get suggestions based on user's query history"""
@@ -328,12 +374,13 @@ class AdvancedHelpBot:
             
             for row in results:
                 cursor.execute("""
-                    SELECT question FROM questions 
-                    WHERE category = ? AND id NOT IN (
+                    SELECT q.question FROM questions q
+                    LEFT JOIN question_stats s ON s.question_id = q.id
+                    WHERE q.category = ? AND q.id NOT IN (
                         SELECT matched_question_id FROM query_log 
                         WHERE session_id = ? AND matched_question_id IS NOT NULL
                     )
-                    ORDER BY feedback DESC, view_count DESC
+                    ORDER BY q.feedback DESC, COALESCE(s.view_count, 0) DESC
                     LIMIT 2
                 """, (row['category'], session_id))
                 
@@ -345,7 +392,7 @@ class AdvancedHelpBot:
             logger.error(f"Error getting suggestions: {e}")
             return []
     
-    def _paginate_results(self, results: List[Dict], page: int = 1, per_page: int = 5) -> Dict:
+    def _paginate_results(self, results: Sequence[Dict], page: int = 1, per_page: int = 5) -> Dict:
         """Paginate results with metadata"""
         total_items = len(results)
         total_pages = max(1, (total_items + per_page - 1) // per_page)
@@ -508,13 +555,12 @@ class AdvancedHelpBot:
     def _handle_question(self, user_input: str, user_name: str, 
                         session_id: str, page: int) -> BotResponse:
         """Handle regular question intent"""
-        # Get all questions from database
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM questions ORDER BY feedback DESC, view_count DESC")
-        questions = [dict(row) for row in cursor.fetchall()]
+        # Questions are POS filtered once, when the index is built; only rows
+        # that changed are preprocessed again
+        index = get_knowledge_base(self.db_path).index("advanced", self.preprocess_text)
         
         # Perform fuzzy matching
-        matches = self._fuzzy_match_questions(user_input, questions)
+        matches = self._fuzzy_match_questions(user_input, index)
         
         if not matches:
             # No matches found
@@ -529,21 +575,21 @@ class AdvancedHelpBot:
                 confidence_score=0.0
             )
         
-        # Extract matched questions and paginate
-        matched_questions = [match[1] for match in matches]
-        confidence_score = matches[0][0] / 100.0  # Convert to 0-1 scale
+        # Only the requested page is ranked, deeper pages are ranked on demand
+        best_score, best_question = matches.best()
+        confidence_score = best_score / 100.0  # Convert to 0-1 scale
         
-        paginated = self._paginate_results(matched_questions, page, per_page=5)
+        paginated = self._paginate_results(matches, page, per_page=5)
         
         # Log the query
-        self._log_query(user_name, session_id, user_input, matched_questions[0]['id'], confidence_score)
+        self._log_query(user_name, session_id, user_input, best_question['id'], confidence_score)
         
         # Update view count for top match
-        self._update_view_count(matched_questions[0]['id'])
+        self._update_view_count(best_question['id'])
         
         return BotResponse(
             type=ResponseType.MATCH,
-            message=f"I found {len(matched_questions)} relevant results:",
+            message=f"I found {len(matches)} relevant results:",
             results=paginated["items"],
             pagination=paginated["pagination"],
             confidence_score=confidence_score
@@ -552,17 +598,8 @@ class AdvancedHelpBot:
     def _get_top_questions(self, limit: int = 5) -> List[Dict]:
         """Get top questions by popularity and feedback"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT q.*, COALESCE(COUNT(ql.id), 0) as query_count
-                FROM questions q
-                LEFT JOIN query_log ql ON q.id = ql.matched_question_id
-                GROUP BY q.id
-                ORDER BY query_count DESC, q.feedback DESC, q.view_count DESC
-                LIMIT ?
-            """, (limit,))
-            
-            return [dict(row) for row in cursor.fetchall()]
+            # Ranked on the question_stats counters by the knowledge-base snapshot
+            return get_knowledge_base(self.db_path).top_questions(limit)
         except Exception as e:
             logger.error(f"Error getting top questions: {e}")
             return []
@@ -571,39 +608,34 @@ class AdvancedHelpBot:
                   matched_question_id: int, confidence_score: float):
         """Log user query with enhanced information"""
         try:
-            processed_query = " ".join(self.preprocess_text(raw_query))
-            cursor = self.conn.cursor()
-            cursor.execute("""
+            processed_query = " ".join(self.preprocess_query(raw_query))
+            write(self.conn, self.db_path, """
                 INSERT INTO query_log (user_name, session_id, raw_query, processed_query, 
                                      matched_question_id, confidence_score, response_type)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (user_name, session_id, raw_query, processed_query, 
                   matched_question_id, confidence_score, "match"))
-            self.conn.commit()
         except Exception as e:
             logger.error(f"Error logging query: {e}")
     
     def _update_view_count(self, question_id: int):
         """Update view count for a question"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                UPDATE questions SET view_count = view_count + 1 
-                WHERE id = ?
-            """, (question_id,))
-            self.conn.commit()
+            # Counted in question_stats: updating questions would invalidate the search index
+            write(self.conn, self.db_path, INCREMENT_VIEW_COUNT, (question_id,))
         except Exception as e:
             logger.error(f"Error updating view count: {e}")
     
     def get_question_details(self, question_id: int) -> Dict:
         """Get detailed information about a specific question"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM questions WHERE id = ?", (question_id,))
-            row = cursor.fetchone()
+            snapshot = get_knowledge_base(self.db_path).snapshot
+            row = snapshot.questions.get(question_id)
             
             if row:
                 question = dict(row)
+                question['feedback'] = snapshot.feedback_of(row)
+                question['view_count'] = snapshot.view_counts.get(question_id, 0)
                 # Add formatted answer with link
                 if question.get('article_link'):
                     question['formatted_answer'] = f"{question['answer']}\n\n📖 More info: {question['article_link']}"
@@ -620,72 +652,26 @@ class AdvancedHelpBot:
                      feedback_score: int, feedback_text: str = "") -> bool:
         """Save user feedback with enhanced tracking"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
+            write(self.conn, self.db_path, """
                 INSERT INTO feedback (user_name, session_id, question_id, 
                                     feedback_score, feedback_text)
                 VALUES (?, ?, ?, ?, ?)
             """, (user_name, session_id, question_id, feedback_score, feedback_text))
             
-            # Update question's average feedback
-            cursor.execute("""
-                UPDATE questions 
-                SET feedback = (
-                    SELECT AVG(feedback_score) 
-                    FROM feedback 
-                    WHERE question_id = ?
-                )
-                WHERE id = ?
-            """, (question_id, question_id))
+            # Update question's average feedback from the running sum and count the
+            # insert trigger keeps in question_stats; queued after the insert, so it counts it
+            write(self.conn, self.db_path, UPDATE_FEEDBACK_AVERAGE,
+                  (question_id, question_id, question_id))
             
-            self.conn.commit()
             return True
         except Exception as e:
             logger.error(f"Error saving feedback: {e}")
             return False
     
     def get_analytics(self, days: int = 7) -> Dict:
-        """Get analytics data for the chatbot"""
+        """Get analytics data for the chatbot, served from the daily rollups"""
         try:
-            cursor = self.conn.cursor()
-            
-            # Query statistics
-            cursor.execute("""
-                SELECT COUNT(*) as total_queries,
-                       AVG(confidence_score) as avg_confidence,
-                       COUNT(DISTINCT session_id) as unique_sessions
-                FROM query_log 
-                WHERE timestamp > datetime('now', '-{} days')
-            """.format(days))
-            query_stats = dict(cursor.fetchone())
-            
-            # Top questions
-            cursor.execute("""
-                SELECT q.question, COUNT(ql.id) as query_count
-                FROM questions q
-                JOIN query_log ql ON q.id = ql.matched_question_id
-                WHERE ql.timestamp > datetime('now', '-{} days')
-                GROUP BY q.id
-                ORDER BY query_count DESC
-                LIMIT 10
-            """.format(days))
-            top_questions = [dict(row) for row in cursor.fetchall()]
-            
-            # Feedback statistics
-            cursor.execute("""
-                SELECT AVG(feedback_score) as avg_feedback,
-                       COUNT(*) as total_feedback
-                FROM feedback 
-                WHERE timestamp > datetime('now', '-{} days')
-            """.format(days))
-            feedback_stats = dict(cursor.fetchone())
-            
-            return {
-                "query_statistics": query_stats,
-                "top_questions": top_questions,
-                "feedback_statistics": feedback_stats,
-                "period_days": days
-            }
+            return rollup_analytics(self.conn, days)
         except Exception as e:
             logger.error(f"Error getting analytics: {e}")
             return {}
@@ -759,7 +745,8 @@ class AdvancedHelpBot:
         }
     
     def close(self):
-        """Close database connection"""
+        """Stop the reconciliation job and close the database connection"""
+        self._reconcile_job.stop()
         if self.conn:
             self.conn.close()
 
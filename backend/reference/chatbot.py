@@ -1,14 +1,20 @@
-import sqlite3
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
 import re
-import nltk
-from rapidfuzz import fuzz
 import random
-
-nltk.download("stopwords")
-stop_words = set(stopwords.words("english"))
-stemmer = PorterStemmer()
+from functools import lru_cache
+from operator import itemgetter
+import config
+from database import get_pool
+from search import nltk_resources
+from search.intents import PhraseMatcher
+from search.knowledge_base import get_knowledge_base
+from search.ranking import RankedMatches
+from search.scoring import score_choices
+from search.spelling import build_speller
+from search.stemming import stem
+from search.tfidf import TfidfIndex
+from write_behind import write
+
+stop_words = nltk_resources.stop_words()
 
 
 GREETING_KEYWORDS = {"hi", "hello", "hey", "greetings", "good morning", "good evening"}
@@ -40,116 +46,159 @@ FILLER_PHRASES = [
     "how do i", "how to", "i want to", "tell me how to", "what is the way to", "help me"
 ]
 
+# Greeting/help detection and filler stripping share one compiled matcher
+PHRASES = PhraseMatcher(
+    intents=[("greeting", GREETING_KEYWORDS), ("help", HELP_KEYWORDS)],
+    fillers=FILLER_PHRASES
+)
+
 def clean_input(text):
-    text = text.lower().strip()
-    for phrase in FILLER_PHRASES:
-        text = text.replace(phrase, "")
-    return text.strip()
+    return PHRASES.scan(text.lower().strip()).text
 
-def preprocess(text):
-    text = clean_input(text)
-    words = re.findall(r'\b\w+\b', text.lower())
-    return [stemmer.stem(w) for w in words if w not in stop_words]
+@lru_cache(maxsize=config.TOKEN_CACHE_SIZE)
+def analyze(text):
+    # Intent and filler-free text from a single matcher pass
+    scan = PHRASES.scan(text.lower().strip())
+    return scan.intent, scan.text
 
-# def is_greeting(text):
-#     return any(word in text.lower() for word in GREETING_KEYWORDS)
+@lru_cache(maxsize=config.TOKEN_CACHE_SIZE)
+def tokenize(clean_text):
+    words = re.findall(r'\b\w+\b', clean_text)
+    return tuple(stem(w) for w in words if w not in stop_words)
 
-# def is_help_request(text):
-#     return any(word in text.lower() for word in HELP_KEYWORDS)
+def preprocess(text):
+    return list(tokenize(analyze(text)[1]))
 
 def is_greeting(text):
-    text = text.lower()
-    for keyword in GREETING_KEYWORDS:
-        if re.search(rf'\b{re.escape(keyword)}\b', text):
-            return True
-    return False
+    return "greeting" in PHRASES.scan(text.lower()).intents
 
 def is_help_request(text):
-    text = text.lower()
-    for phrase in HELP_KEYWORDS:
-        if re.search(rf'\b{re.escape(phrase)}\b', text):
-            return True
-    return False
+    return "help" in PHRASES.scan(text.lower()).intents
 
 
-def match_questions(user_input, questions):
+def fuzzy_matches(input_tokens, index, clean_text=""):
+    # rapidfuzz token_set_ratio over the BM25 + typo-tolerant MinHash shortlist; the
+    # typo lookup sees the query without filler phrases, as the tokens do
+    matches = []
+    candidates = index.candidates(input_tokens, query_text=clean_text)
+    for position, score in score_choices(" ".join(input_tokens), candidates.tokens, score_cutoff=50):
+        matches.append((score, candidates.entries[position].row))
+    return matches
+
+def tfidf_matches(input_tokens, index, clean_text=""):
+    # Cosine similarity against the sparse TF-IDF matrix, scaled to 0-100
+    entries, tfidf = index.derived(
+        "tfidf", lambda entries: (entries, TfidfIndex([e.tokens.split() for e in entries]))
+    )
+    matches = []
+    for position, similarity in tfidf.search(input_tokens, config.TFIDF_TOP_K, config.TFIDF_MIN_SIMILARITY):
+        matches.append((similarity * 100, entries[position].row))
+    return matches
+
+
+def match_questions(user_input, index, speller=None, feedback_of=itemgetter("feedback")):
+    # feedback_of gives a row's current feedback average: rows keep the one they were
+    # read with, and matches are cached, so it is looked up when results are ranked
     user_input = user_input.strip().lower()
+    intent, clean_text = analyze(user_input)
+    with_feedback = lambda row: {**row, "feedback": feedback_of(row)}
 
     # Handle greetings
-    if is_greeting(user_input):
+    if intent == "greeting":
         return {
             "type": "greeting",
             "message": f"{random.choice(GREETINGS)} How can I help you today?",
-            "results": sorted(questions, key=lambda q: -q["feedback"])[:5]
+            "results": [with_feedback(q) for q in sorted(index.rows, key=lambda q: -feedback_of(q))[:5]]
         }
 
     # Handle help phrases
-    if is_help_request(user_input):
+    if intent == "help":
         return {
             "type": "help",
             "message": random.choice(HELP_RESPONSES), 
-            "results": sorted(questions, key=lambda q: -q["feedback"])[:5]
+            "results": [with_feedback(q) for q in sorted(index.rows, key=lambda q: -feedback_of(q))[:5]]
         }
 
-    # Normal fuzzy matching
-    input_tokens = preprocess(user_input)
-    matches = []
-    for row in questions:
-        question_tokens = preprocess(row["question"] + " " + row["tags"])
-        score = fuzz.token_set_ratio(" ".join(input_tokens), " ".join(question_tokens))
-        if score >= 50:
-            matches.append((score, row["feedback"], row))
+    # Fix misspellings against the knowledge-base vocabulary before scoring; only
+    # words that match nothing in the index as typed are corrected
+    if speller is not None:
+        clean_text = speller.correct(clean_text, known=lambda word: stem(word) in index.bm25)
+    input_tokens = list(tokenize(clean_text))
+    engine = tfidf_matches if config.SUGGEST_ENGINE == "tfidf" else fuzzy_matches
+    # Phrasings with the same preprocessed tokens share one cache entry
+    matches = index.cached(
+        (config.SUGGEST_ENGINE, " ".join(input_tokens)),
+        lambda: tuple(engine(input_tokens, index, clean_text))
+    )
 
-    matches.sort(key=lambda x: (-x[0], -x[1]))
     return {
         "type": "match",
-        "results": [row for _, _, row in matches]
+        "results": RankedMatches(
+            matches, key=lambda x: (-x[0], -feedback_of(x[1])), value=lambda x: with_feedback(x[1])
+        )
     }
 
 
 class HelpBot:
-    def __init__(self, db_path="helpbot.db"):
-        self.conn = sqlite3.connect(db_path)
-        self.conn.row_factory = sqlite3.Row
-        
+    def __init__(self, db_path="helpbot.db", pool=None):
+        self.db_path = db_path
+        self.pool = pool or get_pool(db_path)
+
+    @property
+    def conn(self):
+        # Taken per call: the bot may be created on one thread and used on another
+        return self.pool.connection()
+
+    @property
+    def knowledge_base(self):
+        # Reads are served from the in-memory snapshot, reloaded in the background
+        return get_knowledge_base(self.db_path)
+
     def get_top_questions(self, limit=5):
-        q = self.conn.cursor()
-        q.execute("""
-            SELECT questions.*, COUNT(query_log.id) AS query_count
-            FROM questions
-            LEFT JOIN query_log ON questions.id = query_log.matched_question_id
-            GROUP BY questions.id
-            ORDER BY query_count DESC, feedback DESC
-            LIMIT ?
-        """, (limit,))
-        return q.fetchall()
+        return self.knowledge_base.top_questions(limit)
 
     def suggest_questions(self, user_input):
+        index = self.knowledge_base.index("default", preprocess)
+        speller = self.get_speller(index) if config.SPELLING_CORRECTION else None
+        return match_questions(user_input, index, speller, self.knowledge_base.snapshot.feedback_of)
+
+    def get_speller(self, index):
+        # Rebuilt with the rest of the index whenever the questions change
+        return index.derived("speller", lambda entries: build_speller(
+            [entry.text for entry in entries],
+            self._recent_queries(config.SPELLING_QUERY_LOG_ROWS),
+            min_query_count=config.SPELLING_MIN_QUERY_COUNT,
+            max_edit_distance=config.SPELLING_MAX_EDIT_DISTANCE
+        ))
+
+    def _recent_queries(self, limit):
         q = self.conn.cursor()
-        q.execute("SELECT * FROM questions")
-        rows = q.fetchall()
-        return match_questions(user_input, rows)
+        q.execute("SELECT raw_query FROM query_log ORDER BY id DESC LIMIT ?", (limit,))
+        return [row["raw_query"] for row in q.fetchall()]
+
+    def warm_up(self):
+        # Builds the question index, which also fills the stem table with the corpus vocabulary
+        self.knowledge_base.index("default", preprocess)
+
+    def cache_stats(self):
+        index = self.knowledge_base.index("default", preprocess)
+        return index.results.stats()
 
     def get_answer(self, question_id):
-        q = self.conn.cursor()
-        q.execute("SELECT * FROM questions WHERE id = ?", (question_id,))
-        row = q.fetchone()
+        row = self.knowledge_base.question(question_id)
         if row:
             return f"{row['answer']}\nMore info: <a href='{row['article_link']}'>{row['article_link']}</a>"
         return "No answer found."
 
     def log_query(self, user_name, raw_query, matched_question_id):
-        q = self.conn.cursor()
-        q.execute("""
+        # Committed in the background with other writes, see write_behind
+        write(self.pool, self.db_path, """
             INSERT INTO query_log (user_name, raw_query, matched_question_id)
             VALUES (?, ?, ?)
         """, (user_name, raw_query, matched_question_id))
-        self.conn.commit()
 
     def save_feedback(self, user_name, question_id, score):
-        q = self.conn.cursor()
-        q.execute("""
+        write(self.pool, self.db_path, """
             INSERT INTO feedback (user_name, question_id, feedback_score)
             VALUES (?, ?, ?)
-        """, (user_name, question_id, score))
-        self.conn.commit()
\ No newline at end of file
+        """, (user_name, question_id, score))
\ No newline at end of file
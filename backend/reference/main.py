@@ -1,4 +1,10 @@
-from chatbot import HelpBot
+"""Command-line chat with the simple bot, on the helpbot.db of the working directory.
+
+Run from backend/, where the bot's config, database and search modules live:
+
+    python -m reference.main
+"""
+from reference.chatbot import HelpBot
 
 def run_bot():
     bot = HelpBot()
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from database import get_db
+import config
+from analytics import get_aggregator
+from concurrency import run_blocking
+from database import DATABASE_URL, get_db
 from reference.chatbot import HelpBot
+from search.knowledge_base import get_knowledge_base
 
 router = APIRouter(
     prefix="/chatbot",
@@ -23,16 +29,20 @@ class QuestionResponse(BaseModel):
     question: str
     answer: str
     article_link: str
-    feedback: int
+    feedback: float
 
 class GreetingResponse(BaseModel):
     greetings: str
     questions: List[QuestionResponse]
+
+
+async def get_bot(pool = Depends(get_db)) -> HelpBot:
+    """A HelpBot on the pooled connections; cheap, nothing is opened here"""
+    return HelpBot(DATABASE_URL, pool=pool)
         
 
 @router.get("/")
-def greet_user(user_name = 'Test User'):
-    bot = HelpBot()
+def greet_user(user_name = 'Test User', bot: HelpBot = Depends(get_bot)):
     questions = bot.get_top_questions()
     greetings = f"Hello! {user_name}, How can I assist you?"
     return {
@@ -41,19 +51,23 @@ def greet_user(user_name = 'Test User'):
     }
 
 @router.get("/top-questions", response_model=List[QuestionResponse])
-async def get_top_questions(limit: int = 5):
+async def get_top_questions(limit: int = 5, bot: HelpBot = Depends(get_bot)):
     """Get the top most common questions"""
-    bot = HelpBot()
-    questions = bot.get_top_questions(limit)
+    questions = await run_blocking(bot.get_top_questions, limit)
     return [QuestionResponse(**dict(q)) for q in questions]
 
 @router.post("/suggest")
-async def suggest_questions(query: ChatQuery):
+async def suggest_questions(query: ChatQuery, bot: HelpBot = Depends(get_bot)):
     """
     Suggest questions or return answer if user selected a number.
     Behaves like the CLI version.
     """
-    bot = HelpBot()
+    # Lookups, logging, fuzzy scoring and encoding the response all block, so the
+    # whole exchange runs off the loop
+    return await run_blocking(lambda: JSONResponse(jsonable_encoder(_suggest(bot, query))))
+
+
+def _suggest(bot: HelpBot, query: ChatQuery):
     user_input = query.user_input.strip().lower()
     user_name = query.user_name.strip()
 
@@ -99,25 +113,48 @@ async def suggest_questions(query: ChatQuery):
     }
 
 
+@router.get("/autocomplete")
+def autocomplete(q: str = "", limit: int = 8):
+    """Typeahead suggestions from the in-memory prefix index, safe to call per keystroke"""
+    index = get_knowledge_base(DATABASE_URL).autocomplete()
+    limit = max(0, min(limit, config.AUTOCOMPLETE_MAX_RESULTS))
+    return {"query": q, "suggestions": index.complete(q, limit)}
+
+
+@router.get("/cache-stats")
+def get_cache_stats(bot: HelpBot = Depends(get_bot)):
+    """Hit/miss/eviction counters of the suggestion result cache"""
+    return bot.cache_stats()
+
+
+@router.get("/analytics")
+def get_analytics(days: int = 7):
+    """Query, top-question and feedback statistics for the last `days` days.
+
+    Served from snapshots refreshed in the background; `generated_at` and
+    `age_seconds` tell how fresh they are.
+    """
+    if not 1 <= days <= config.ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {config.ANALYTICS_MAX_DAYS}")
+    return get_aggregator(DATABASE_URL).get(days)
+
+
 @router.get("/answer/{question_id}")
-async def get_answer(question_id: int):
+async def get_answer(question_id: int, bot: HelpBot = Depends(get_bot)):
     """Get answer for a specific question"""
-    bot = HelpBot()
-    answer = bot.get_answer(question_id)
+    answer = await run_blocking(bot.get_answer, question_id)
     if answer == "No answer found.":
         raise HTTPException(status_code=404, detail="Question not found")
     return {"answer": answer}
 
 @router.post("/feedback")
-async def save_feedback(feedback: FeedbackRequest):
+async def save_feedback(feedback: FeedbackRequest, bot: HelpBot = Depends(get_bot)):
     """Save user feedback for a question"""
-    bot = HelpBot()
-    bot.save_feedback(feedback.user_name, feedback.question_id, feedback.score)
+    await run_blocking(bot.save_feedback, feedback.user_name, feedback.question_id, feedback.score)
     return {"message": "Feedback saved successfully"}
 
 @router.post("/log-query")
-async def log_query(query: ChatQuery, matched_question_id: int):
+async def log_query(query: ChatQuery, matched_question_id: int, bot: HelpBot = Depends(get_bot)):
     """Log a user query and its matched question"""
-    bot = HelpBot()
-    bot.log_query(query.user_name, query.query, matched_question_id)
+    await run_blocking(bot.log_query, query.user_name, query.query, matched_question_id)
     return {"message": "Query logged successfully"} 
\ No newline at end of file
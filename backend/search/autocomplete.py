@@ -0,0 +1,112 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Mapping
+
+from search import nltk_resources
+from search.stemming import stem
+
+_WORDS = re.compile(r"\w+")
+
+
+def unique_justseen(items):
+    """Items of a sorted iterable with consecutive duplicates dropped"""
+    return (item for item, _ in groupby(items))
+
+
+class PrefixTrie:
+    """Prefix tree over words where every node keeps its best-ranked question ids.
+
+    Words must be inserted in rank order of their questions; a node then holds
+    the top_k ids among all words below it, so a prefix lookup is a walk down
+    len(prefix) nodes with no ranking at query time.
+    """
+
+    def __init__(self, top_k: int):
+        self.top_k = top_k
+        self.root = ({}, [])  # (children, top ids)
+
+    def insert(self, word: str, question_id: int):
+        node = self.root
+        for char in word:
+            node = node[0].setdefault(char, ({}, []))
+            top = node[1]
+            if len(top) < self.top_k and question_id not in top:
+                top.append(question_id)
+
+    def top(self, prefix: str) -> List[int]:
+        node = self.root
+        for char in prefix:
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return node[1]
+
+
+class AutocompleteIndex:
+    """Typeahead over question titles and stemmed tags, ranked by popularity.
+
+    Built from the questions rows and query counts of a knowledge-base snapshot;
+    the KnowledgeBase rebuilds it in the background and swaps it in whole.
+    Questions are numbered in rank order and every posting list is kept in that
+    order, so a multi-word lookup walks the shortest candidate list best first,
+    either the rarest earlier word's or the merged lists of the words completing
+    the prefix, and stops after `limit` hits.
+    """
+
+    def __init__(self, rows: Iterable, popularity: Mapping[int, int],
+                 feedback_of: Callable[[object], float] = itemgetter("feedback"), top_k: int = 10):
+        ranked = sorted(rows, key=lambda r: (-popularity.get(r["id"], 0), -(feedback_of(r) or 0), r["id"]))
+        self.questions = [{"id": row["id"], "question": row["question"]} for row in ranked]
+        self.words: List[frozenset] = []  # words of the question at each rank
+        self.postings: Dict[str, List[int]] = defaultdict(list)  # word -> ranks, ascending
+        self.trie = PrefixTrie(top_k)
+
+        for position, row in enumerate(ranked):
+            words = set(_WORDS.findall(row["question"].lower()))
+            words.update(stem(w) for w in _WORDS.findall((row["tags"] or "").lower()))
+            self.words.append(frozenset(words))
+            for word in words:
+                self.postings[word].append(position)
+                self.trie.insert(word, position)
+        self.vocabulary = sorted(self.postings)
+
+    def complete(self, query: str, limit: int = 8) -> List[Dict]:
+        """Questions having a word that starts with the last query word and all the earlier ones"""
+        words = _WORDS.findall(query.lower())
+        if not words or limit <= 0:
+            return []
+        *earlier, prefix = words
+        stop_words = nltk_resources.stop_words()
+        earlier = [w for w in earlier if w not in stop_words]
+        if not earlier:
+            return [self.questions[position] for position in self.trie.top(prefix)[:limit]]
+
+        required = set()
+        for word in earlier:
+            if word not in self.postings:
+                word = stem(word)
+                if word not in self.postings:
+                    return []
+            required.add(word)
+        # Every word the last one may be completed to
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "\U0010ffff", start)
+        completions = self.vocabulary[start:end]
+        if not completions:
+            return []
+        rarest = min(required, key=lambda word: len(self.postings[word]))
+        if sum(len(self.postings[word]) for word in completions) < len(self.postings[rarest]):
+            # Fewer questions complete the prefix than have the rarest word
+            candidates = unique_justseen(heapq.merge(*(self.postings[word] for word in completions)))
+            matches = (position for position in candidates if required <= self.words[position])
+        else:
+            completions = set(completions)
+            matches = (
+                position for position in self.postings[rarest]
+                if required <= self.words[position] and not completions.isdisjoint(self.words[position])
+            )
+        return [self.questions[position] for position in islice(matches, limit)]
@@ -0,0 +1,71 @@
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class BM25Index:
+    """Inverted index over stemmed terms returning a BM25-ranked shortlist.
+
+    Per-posting impacts (idf times the term weight) are computed at build time,
+    so answering a query is a sum over the postings of the query terms only.
+    Each term's postings are a pair of numpy arrays and the sum is a single
+    bincount, which keeps common terms with tens of thousands of postings cheap.
+    """
+
+    def __init__(self, documents: Sequence[Iterable[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+        counts = [Counter(terms) for terms in documents]
+        lengths = [sum(c.values()) for c in counts]
+        avg_length = (sum(lengths) / self.size) if self.size else 0.0
+
+        postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for doc_id, (terms, length) in enumerate(zip(counts, lengths)):
+            norm = k1 * (1 - b + b * length / avg_length) if avg_length else k1
+            for term, tf in terms.items():
+                postings[term].append((doc_id, tf * (k1 + 1) / (tf + norm)))
+
+        self.idf = {
+            term: math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+        self.postings = {
+            term: (np.fromiter((doc_id for doc_id, _ in docs), np.int64, len(docs)),
+                   np.fromiter((weight for _, weight in docs), np.float64, len(docs)) * self.idf[term])
+            for term, docs in postings.items()
+        }
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.postings
+
+    def scores(self, query_terms: Iterable[str]) -> Dict[int, float]:
+        """BM25 score for every document sharing at least one term with the query"""
+        terms = [term for term in set(query_terms) if term in self.postings]
+        if not terms:
+            return {}
+        totals = self._totals(terms)
+        hits = np.flatnonzero(totals)
+        return dict(zip(hits.tolist(), totals[hits].tolist()))
+
+    def top_n(self, query_terms: Iterable[str], n: int) -> List[int]:
+        """Document ids of the n best BM25 matches, best first"""
+        terms = [term for term in set(query_terms) if term in self.postings]
+        if not terms or n <= 0:
+            return []
+        totals = self._totals(terms)
+        hits = np.flatnonzero(totals)
+        if len(hits) > n:
+            hits = hits[np.argpartition(-totals[hits], n - 1)[:n]]
+        # Best first, ties in document order
+        return hits[np.lexsort((hits, -totals[hits]))].tolist()
+
+    def _totals(self, terms: List[str]):
+        if len(terms) == 1:
+            doc_ids, impacts = self.postings[terms[0]]
+        else:
+            doc_ids = np.concatenate([self.postings[term][0] for term in terms])
+            impacts = np.concatenate([self.postings[term][1] for term in terms])
+        return np.bincount(doc_ids, weights=impacts, minlength=self.size)
@@ -0,0 +1,79 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+def _is_boundary(text: str, i: int) -> bool:
+    """Same test as the regex \\b at position i"""
+    before = i > 0 and _WORD_CHAR.match(text[i - 1]) is not None
+    after = i < len(text) and _WORD_CHAR.match(text[i]) is not None
+    return before != after
+
+
+class PhraseScan(NamedTuple):
+    intent: Optional[str]  # highest-priority intent found, if any
+    intents: List[str]  # every intent found, in priority order
+    text: str  # input with filler phrases removed and stripped
+
+
+class PhraseMatcher:
+    """Intent keywords and filler phrases found in one pass over the input.
+
+    All phrases are compiled into a single lookahead alternation, longest first,
+    so one scan reports every (possibly overlapping) occurrence. Intent keywords
+    must sit on word boundaries, like re.search(rf'\\b{keyword}\\b'); fillers are
+    removed wherever they occur, like str.replace.
+    """
+
+    def __init__(self, intents: Sequence[Tuple[str, Iterable[str]]] = (), fillers: Iterable[str] = ()):
+        self.priority = {name: rank for rank, (name, _) in enumerate(intents)}
+        roles: Dict[str, set] = defaultdict(set)
+        for name, keywords in intents:
+            for keyword in keywords:
+                roles[keyword.lower()].add(name)
+        for phrase in fillers:
+            roles[phrase.lower()].add(None)  # None marks a filler
+
+        # A hit only reports the longest phrase starting at a position, so each
+        # phrase also carries the roles of every shorter phrase it starts with.
+        self._hits: Dict[str, List[Tuple[int, frozenset]]] = {
+            phrase: [
+                (len(prefix), frozenset(roles[prefix]))
+                for prefix in roles if phrase.startswith(prefix)
+            ]
+            for phrase in roles
+        }
+        alternation = "|".join(re.escape(p) for p in sorted(roles, key=len, reverse=True))
+        self._pattern = re.compile(f"(?=({alternation}))") if roles else None
+
+    def scan(self, text: str) -> PhraseScan:
+        """Classify and strip fillers from already lower-cased text"""
+        found = set()
+        spans = []
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text):
+                start = match.start()
+                for length, roles in self._hits[match.group(1)]:
+                    end = start + length
+                    for role in roles:
+                        if role is None:
+                            spans.append((start, end))
+                        elif _is_boundary(text, start) and _is_boundary(text, end):
+                            found.add(role)
+
+        intents = sorted(found, key=self.priority.__getitem__)
+        return PhraseScan(intents[0] if intents else None, intents, self._strip(text, spans).strip())
+
+    @staticmethod
+    def _strip(text: str, spans: List[Tuple[int, int]]) -> str:
+        if not spans:
+            return text
+        pieces, position = [], 0
+        for start, end in sorted(spans):
+            if start > position:
+                pieces.append(text[position:start])
+            position = max(position, end)
+        pieces.append(text[position:])
+        return "".join(pieces)
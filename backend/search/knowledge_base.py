@@ -0,0 +1,174 @@
+"""Read-only, in-memory snapshot of the knowledge base served to the bots.
+
+Answers, question details, the top-questions list and the search indexes all
+come from an immutable KnowledgeBaseSnapshot stamped with the kb_version its
+questions were read at. A reader takes the current snapshot with a plain
+attribute read, no lock and no SQLite, and keeps using it for the whole request.
+A background job checks kb_version every KB_RELOAD_SECONDS: when the questions
+changed it reads them once, rebuilds the question indexes from those rows and
+swaps the new snapshot in whole. Every reload also re-reads the question
+counters and the feedback averages of voted questions, so the top questions,
+view counts and feedback lag by at most that interval; votes never cost an
+index rebuild.
+The autocomplete index is rebuilt from the snapshot by a second job, every
+AUTOCOMPLETE_REFRESH_SECONDS once it has been used.
+"""
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import config
+from database import ConnectionPool, get_kb_version, get_pool, top_questions
+from jobs import PeriodicJob
+from search.autocomplete import AutocompleteIndex
+from search.question_index import QuestionIndex
+
+
+class KnowledgeBaseSnapshot(NamedTuple):
+    version: int  # kb_version the questions were read at
+    loaded_at: float  # unix time the counters were read
+    questions: Mapping[int, object]  # question id -> questions row
+    view_counts: Mapping[int, int]  # question id -> views, when above 0
+    query_counts: Mapping[int, int]  # question id -> times matched, when above 0
+    feedback: Mapping[int, float]  # question id -> live feedback average, when voted on
+    top: Tuple[Dict, ...]  # top_questions() rows, most asked first
+
+    def feedback_of(self, row) -> float:
+        """Feedback average of a questions row, which may predate the latest votes"""
+        return self.feedback.get(row["id"], row["feedback"])
+
+
+class KnowledgeBase:
+    """Current snapshot of one database plus the question indexes built from it"""
+
+    def __init__(self, pool: ConnectionPool, reload_seconds: float = config.KB_RELOAD_SECONDS,
+                 top_size: int = config.TOP_QUESTIONS_SNAPSHOT_SIZE):
+        self.pool = pool
+        self.reload_seconds = reload_seconds
+        self.top_size = top_size
+        self._snapshot: Optional[KnowledgeBaseSnapshot] = None
+        self._indexes: Dict[str, QuestionIndex] = {}
+        self._autocomplete: Optional[AutocompleteIndex] = None
+        # Serialises reloads and index creation; readers never take it
+        self._lock = threading.Lock()
+        self._job = PeriodicJob("kb-reload", reload_seconds, self.reload)
+        self._autocomplete_job = PeriodicJob(
+            "autocomplete-rebuild", config.AUTOCOMPLETE_REFRESH_SECONDS, self._rebuild_autocomplete
+        )
+
+    def start(self):
+        self._job.start()
+        self._autocomplete_job.start()
+
+    def stop(self):
+        self._autocomplete_job.stop()
+        self._job.stop()
+
+    @property
+    def snapshot(self) -> KnowledgeBaseSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or self.reload_seconds <= 0:
+            snapshot = self.reload()
+        return snapshot
+
+    def reload(self) -> KnowledgeBaseSnapshot:
+        """Read a new snapshot and swap it in, re-reading the questions only if kb_version moved"""
+        with self._lock:
+            conn = self.pool.connection()
+            current = self._snapshot
+            version = get_kb_version(conn)
+            if current is not None and current.version == version:
+                questions = current.questions
+            else:
+                questions = MappingProxyType(
+                    {row["id"]: row for row in conn.execute("SELECT * FROM questions")}
+                )
+                # Indexes switch over before the snapshot does, so a reader that
+                # sees the new version never has to rebuild one itself
+                for index in self._indexes.values():
+                    index.load(questions.values(), version)
+            counters = conn.execute("""
+                SELECT s.question_id, s.view_count, s.query_count, s.feedback_count, q.feedback
+                FROM question_stats s LEFT JOIN questions q ON q.id = s.question_id
+                WHERE s.view_count > 0 OR s.query_count > 0 OR s.feedback_count > 0
+            """).fetchall()
+            snapshot = self._snapshot = KnowledgeBaseSnapshot(
+                version, time.time(), questions,
+                MappingProxyType({row[0]: row[1] for row in counters if row[1] > 0}),
+                MappingProxyType({row[0]: row[2] for row in counters if row[2] > 0}),
+                MappingProxyType({row[0]: row[4] for row in counters if row[3] > 0 and row[4] is not None}),
+                tuple(top_questions(conn, self.top_size)),
+            )
+        return snapshot
+
+    def index(self, name: str, preprocess: Callable[[str], List[str]]) -> QuestionIndex:
+        """Question index `name`, built on first use and kept in step with the snapshot"""
+        snapshot = self.snapshot
+        index = self._indexes.get(name)
+        if index is None or index.version != snapshot.version:
+            with self._lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = self._indexes[name] = QuestionIndex(preprocess)
+                snapshot = self._snapshot
+                index.load(snapshot.questions.values(), snapshot.version)
+        return index
+
+    def autocomplete(self) -> AutocompleteIndex:
+        """Autocomplete index, built on first use and then only by the rebuild job"""
+        index = self._autocomplete
+        if index is None:
+            snapshot = self.snapshot
+            with self._lock:
+                if self._autocomplete is None:
+                    self._autocomplete = self._build_autocomplete(snapshot)
+                index = self._autocomplete
+        return index
+
+    def _rebuild_autocomplete(self):
+        if self._autocomplete is not None:
+            self._autocomplete = self._build_autocomplete(self.snapshot)
+
+    @staticmethod
+    def _build_autocomplete(snapshot: KnowledgeBaseSnapshot) -> AutocompleteIndex:
+        return AutocompleteIndex(
+            snapshot.questions.values(), snapshot.query_counts, snapshot.feedback_of,
+            top_k=config.AUTOCOMPLETE_MAX_RESULTS
+        )
+
+    def question(self, question_id: int):
+        """questions row of an id, None if it is not in the snapshot"""
+        return self.snapshot.questions.get(question_id)
+
+    def top_questions(self, limit: int = 5) -> List[Dict]:
+        snapshot = self.snapshot
+        if limit < 0 or (limit > len(snapshot.top) and len(snapshot.top) == self.top_size):
+            # Deeper than the snapshot ranks, rank it in SQLite
+            return top_questions(self.pool.connection(), limit)
+        return [dict(question) for question in snapshot.top[:limit]]
+
+
+_knowledge_bases: Dict[str, KnowledgeBase] = {}
+_registry_lock = threading.Lock()
+
+
+def get_knowledge_base(db_path: str) -> KnowledgeBase:
+    """Process-wide knowledge base of a database, reloading in the background from first use"""
+    key = os.path.abspath(db_path)
+    with _registry_lock:
+        knowledge_base = _knowledge_bases.get(key)
+        if knowledge_base is None:
+            knowledge_base = _knowledge_bases[key] = KnowledgeBase(get_pool(db_path))
+            knowledge_base.start()
+    return knowledge_base
+
+
+def close_knowledge_bases():
+    """Stop the reload jobs; called on app shutdown"""
+    with _registry_lock:
+        knowledge_bases = list(_knowledge_bases.values())
+        _knowledge_bases.clear()
+    for knowledge_base in knowledge_bases:
+        knowledge_base.stop()
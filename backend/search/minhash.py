@@ -0,0 +1,119 @@
+import heapq
+import random
+import threading
+import zlib
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+_PRIME = (1 << 61) - 1
+
+
+def trigrams(word: str) -> Set[str]:
+    """Character trigrams of a word padded with '#', so short words still shingle"""
+    padded = f"#{word}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MinHashLSH:
+    """Typo-tolerant document lookup through the character trigrams of their words.
+
+    Every distinct word gets a MinHash signature over its trigrams, and LSH banding
+    files similar words under a shared bucket. A misspelt query word therefore
+    reaches the documents containing its correct spelling without scanning the
+    vocabulary. Documents can be added and removed one at a time.
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 2, threshold: float = 0.5, seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        self.threshold = threshold
+        rng = random.Random(seed)
+        self._coefficients = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(bands * rows)
+        ]
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._buckets: Dict[tuple, Set[str]] = defaultdict(set)
+        self._postings: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._doc_words: Dict[Hashable, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_words)
+
+    def signature(self, word: str) -> Tuple[int, ...]:
+        shingles = [zlib.crc32(gram.encode()) for gram in trigrams(word)]
+        return tuple(min((a * x + b) % _PRIME for x in shingles) for a, b in self._coefficients)
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def add(self, doc_id: Hashable, words: Iterable[str]):
+        words = set(words)
+        with self._lock:
+            self._remove(doc_id)
+            self._doc_words[doc_id] = words
+            for word in words:
+                if word not in self._signatures:
+                    signature = self._signatures[word] = self.signature(word)
+                    for key in self._band_keys(signature):
+                        self._buckets[key].add(word)
+                self._postings[word].add(doc_id)
+
+    def remove(self, doc_id: Hashable):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: Hashable):
+        for word in self._doc_words.pop(doc_id, ()):
+            docs = self._postings[word]
+            docs.discard(doc_id)
+            if docs:
+                continue
+            # Last document using the word: drop it from the vocabulary too
+            del self._postings[word]
+            for key in self._band_keys(self._signatures.pop(word)):
+                bucket = self._buckets[key]
+                bucket.discard(word)
+                if not bucket:
+                    del self._buckets[key]
+
+    def similar_words(self, word: str) -> Dict[str, float]:
+        """Indexed words whose estimated trigram Jaccard similarity reaches the threshold"""
+        signature = self._signatures.get(word) or self.signature(word)
+        size = len(signature)
+        with self._lock:
+            seen = set()
+            for key in self._band_keys(signature):
+                seen.update(self._buckets.get(key, ()))
+            similar = {}
+            for other in seen:
+                estimate = sum(x == y for x, y in zip(signature, self._signatures[other])) / size
+                if estimate >= self.threshold:
+                    similar[other] = estimate
+        return similar
+
+    def query(self, words: Iterable[str], limit: int, max_postings: Optional[int] = None) -> List[Hashable]:
+        """Ids of up to `limit` documents best covering the misspelt words.
+
+        Words indexed as typed are skipped, exact matches are found without
+        MinHash, and at most max_postings documents (default `limit`) are read
+        per similar word, so a query never copies a common word's posting list.
+        """
+        if max_postings is None:
+            max_postings = limit
+        with self._lock:
+            misspelt = [word for word in set(words) if word not in self._postings]
+        scores: Dict[Hashable, float] = defaultdict(float)
+        for word in misspelt:
+            best: Dict[Hashable, float] = {}
+            for other, similarity in self.similar_words(word).items():
+                with self._lock:
+                    docs = list(islice(self._postings.get(other, ()), max_postings))
+                for doc_id in docs:
+                    if similarity > best.get(doc_id, 0.0):
+                        best[doc_id] = similarity
+            for doc_id, similarity in best.items():
+                scores[doc_id] += similarity
+        return heapq.nlargest(limit, scores, key=scores.__getitem__)
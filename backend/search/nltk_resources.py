@@ -0,0 +1,89 @@
+"""NLTK data loaded from local directories only, on first use.
+
+Nothing here downloads at import or request time. Data is provisioned ahead of
+time with `python -m search.nltk_resources` (e.g. while building the image)
+into HELPBOT_NLTK_DATA, or found on NLTK's usual search path. If a resource is
+missing the bot degrades instead of failing: a bundled stopword list, whitespace
+tokenizing, and no POS filtering.
+"""
+import logging
+import sys
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Tuple
+
+import nltk
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Download name -> path checked with nltk.data.find
+RESOURCES = {
+    "stopwords": "corpora/stopwords",
+    "punkt_tab": "tokenizers/punkt_tab/english/",
+    "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng/",
+}
+
+# NLTK's English stopword list, used when the corpus is not provisioned
+BUNDLED_STOP_WORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours
+yourself yourselves he him his himself she she's her hers herself it it's its
+itself they them their theirs themselves what which who whom this that that'll
+these those am is are was were be been being have has had having do does did
+doing a an the and but if or because as until while of at by for with about
+against between into through during before after above below to from up down in
+out on off over under again further then once here there when where why how all
+any both each few more most other some such no nor not only own same so than too
+very s t can will just don don't should should've now d ll m o re ve y ain aren
+aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't haven
+haven't isn isn't ma mightn mightn't mustn mustn't needn needn't shan shan't
+shouldn shouldn't wasn wasn't weren weren't won won't wouldn wouldn't
+""".split())
+
+if config.NLTK_DATA_DIR not in nltk.data.path:
+    nltk.data.path.insert(0, config.NLTK_DATA_DIR)
+
+
+@lru_cache(maxsize=None)
+def available(name: str) -> bool:
+    """Whether a resource is on disk; checked once per process"""
+    try:
+        nltk.data.find(RESOURCES[name])
+        return True
+    except LookupError:
+        logger.warning(f"NLTK resource '{name}' not provisioned, using fallback")
+        return False
+
+
+@lru_cache(maxsize=None)
+def stop_words() -> FrozenSet[str]:
+    if not available("stopwords"):
+        return BUNDLED_STOP_WORDS
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words("english"))
+
+
+def word_tokenize(text: str) -> List[str]:
+    if not available("punkt_tab"):
+        return text.split()
+    return nltk.word_tokenize(text)
+
+
+def pos_tag(tokens: List[str]) -> Optional[List[Tuple[str, str]]]:
+    """POS tags from the perceptron tagger, loaded on first call; None if not provisioned"""
+    if not available("averaged_perceptron_tagger_eng"):
+        return None
+    return nltk.pos_tag(tokens)
+
+
+def provision(download_dir: str = config.NLTK_DATA_DIR) -> bool:
+    """Download every resource into download_dir; meant for build time, not for workers"""
+    ok = True
+    for name in RESOURCES:
+        ok = nltk.download(name, download_dir=download_dir, quiet=True) and ok
+    available.cache_clear()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if provision(*sys.argv[1:]) else 1)
@@ -0,0 +1,137 @@
+"""Blended scoring spread over a process pool, for knowledge bases too large for one core.
+
+The corpus is packed once into a multiprocessing.shared_memory block: a count,
+two offset tables and the UTF-8 bytes of the token strings and lower-cased
+questions. A request only sends the block name, a slice and the query to a
+worker; workers attach to the block by name and decode it once per version.
+Workers come from a forkserver rather than a fork of the server process, whose
+threads may hold locks at fork time.
+"""
+import multiprocessing
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+
+import config
+from search.scoring import blended_scores
+
+_WORD = array("Q").itemsize
+
+
+def _pack(strings: Sequence[str]) -> Tuple[array, bytes]:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("Q", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    return offsets, b"".join(encoded)
+
+
+class SharedCorpus:
+    """Token strings and lower-cased questions of a corpus, in shared memory.
+
+    The block is unlinked when the object is garbage collected, i.e. once the
+    index state it was derived from has been replaced and no request uses it.
+    """
+
+    def __init__(self, tokens: Sequence[str], questions: Sequence[str]):
+        self.size = len(tokens)
+        token_offsets, token_bytes = _pack(tokens)
+        question_offsets, question_bytes = _pack(questions)
+        header = array("Q", [self.size]) + token_offsets + question_offsets
+        payload = header.tobytes() + token_bytes + question_bytes
+        self._block = shared_memory.SharedMemory(create=True, size=max(len(payload), 1))
+        self._block.buf[:len(payload)] = payload
+        self.name = self._block.name
+        weakref.finalize(self, _release, self._block)
+
+
+def _release(block: shared_memory.SharedMemory):
+    block.close()
+    block.unlink()
+
+
+def _read(buf) -> Tuple[List[str], List[str]]:
+    words = buf[:_WORD].cast("Q")
+    size = words[0]
+    words.release()
+    table = buf[:_WORD * (1 + 2 * (size + 1))].cast("Q")
+    try:
+        token_offsets = table[1:size + 2].tolist()
+        question_offsets = table[size + 2:2 * size + 3].tolist()
+    finally:
+        table.release()
+    start = _WORD * (1 + 2 * (size + 1))
+    questions_start = start + token_offsets[-1]
+    tokens = [bytes(buf[start + a:start + b]).decode("utf-8")
+              for a, b in zip(token_offsets, token_offsets[1:])]
+    questions = [bytes(buf[questions_start + a:questions_start + b]).decode("utf-8")
+                 for a, b in zip(question_offsets, question_offsets[1:])]
+    return tokens, questions
+
+
+# Worker side: corpora decoded from blocks this process attached to, by block name
+_attached: "OrderedDict[str, Tuple[List[str], List[str]]]" = OrderedDict()
+_ATTACHED_MAX = 4
+
+
+def _corpus(name: str) -> Tuple[List[str], List[str]]:
+    corpus = _attached.get(name)
+    if corpus is None:
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            corpus = _attached[name] = _read(block.buf)
+        finally:
+            block.close()
+        while len(_attached) > _ATTACHED_MAX:
+            _attached.popitem(last=False)
+    _attached.move_to_end(name)
+    return corpus
+
+
+def _score_slice(name: str, start: int, stop: int, query_text: str, raw_query: str,
+                 min_score: float) -> List[Tuple[int, float]]:
+    tokens, questions = _corpus(name)
+    scores = blended_scores(query_text, raw_query, tokens[start:stop], questions[start:stop], workers=1)
+    return [(start + i, score) for i, score in enumerate(scores) if score >= min_score]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=config.MATCHING_PROCESSES,
+                                            mp_context=multiprocessing.get_context("forkserver"))
+    return _pool
+
+
+def close_process_pool():
+    """Stop the worker processes; called on app shutdown"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def score_shared(corpus: SharedCorpus, query_text: str, raw_query: str,
+                 min_score: float = 0) -> List[Tuple[int, float]]:
+    """(position, blended score) of every corpus entry scoring at least min_score"""
+    if corpus.size == 0:
+        return []
+    chunks = max(1, min(config.MATCHING_PROCESSES * 2, corpus.size // config.MATCHING_CHUNK_SIZE))
+    step = -(-corpus.size // chunks)
+    futures = [
+        _get_pool().submit(_score_slice, corpus.name, start, min(start + step, corpus.size),
+                           query_text, raw_query, min_score)
+        for start in range(0, corpus.size, step)
+    ]
+    return [hit for future in futures for hit in future.result()]
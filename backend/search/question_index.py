@@ -0,0 +1,193 @@
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import config
+from search import nltk_resources
+from search.bm25 import BM25Index
+from search.minhash import MinHashLSH
+from search.result_cache import ResultCache
+from search.stemming import stem
+
+
+@dataclass(frozen=True)
+class IndexedQuestion:
+    row: object
+    text: str
+    tokens: str
+    category: Optional[str]
+    terms: tuple  # stemmed question, tags and category tokens fed to BM25
+
+
+class Candidates(NamedTuple):
+    entries: List[IndexedQuestion]
+    tokens: List[str]  # preprocessed token strings, aligned with entries
+    questions: List[str]  # lower-cased question titles, aligned with entries
+
+
+@dataclass(frozen=True)
+class _IndexState:
+    corpus: Candidates
+    bm25: BM25Index
+    positions: Dict[object, int]  # question id -> position in corpus
+    derived: dict  # lazily built structures, see QuestionIndex.derived
+
+
+def _build_state(entries: List[IndexedQuestion]) -> _IndexState:
+    corpus = Candidates(
+        entries,
+        [entry.tokens for entry in entries],
+        [entry.row["question"].lower() for entry in entries],
+    )
+    return _IndexState(
+        corpus,
+        BM25Index([entry.terms for entry in entries]),
+        {entry.row["id"]: position for position, entry in enumerate(entries)},
+        {},
+    )
+
+
+def question_text(row) -> str:
+    """Text a question is matched on: the question plus its tags"""
+    return f"{row['question']} {row['tags'] or ''}"
+
+
+def _category(row) -> Optional[str]:
+    return row["category"] if "category" in row.keys() else None
+
+
+def typo_words(text: str) -> List[str]:
+    """Unstemmed words the MinHash index matches misspellings against"""
+    stop_words = nltk_resources.stop_words()
+    return [w for w in re.findall(r"\w+", text.lower()) if len(w) > 2 and w not in stop_words]
+
+
+class QuestionIndex:
+    """Preprocessed questions kept in memory between requests.
+
+    The KnowledgeBase loads it with the snapshot's rows whenever kb_version moves,
+    and only rows whose question/tags text changed are preprocessed again.
+    """
+
+    def __init__(self, preprocess: Callable[[str], List[str]],
+                 text_for: Callable[[object], str] = question_text):
+        self._preprocess = preprocess
+        self._text_for = text_for
+        self._lock = threading.Lock()
+        self.version: Optional[int] = None
+        # Entries and the structures derived from them are swapped as one object
+        # so concurrent readers never see a mix of two refreshes.
+        self._state = _build_state([])
+        self.results = ResultCache(config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+        # Patched row by row on refresh rather than rebuilt
+        self.typos = MinHashLSH(threshold=config.MINHASH_THRESHOLD)
+
+    @property
+    def entries(self) -> List[IndexedQuestion]:
+        return self._state.corpus.entries
+
+    @property
+    def bm25(self) -> BM25Index:
+        return self._state.bm25
+
+    @property
+    def rows(self) -> List[object]:
+        return [entry.row for entry in self.entries]
+
+    def derived(self, name: str, build: Callable[[List[IndexedQuestion]], object]):
+        """Structure built from the current entries on first use, e.g. the TF-IDF matrix"""
+        state = self._state
+        value = state.derived.get(name)
+        if value is None:
+            value = state.derived[name] = build(state.corpus.entries)
+        return value
+
+    def cached(self, key, compute: Callable[[], object]):
+        """Value of compute() for key at the current version, served from the result cache"""
+        key = (self.version, key)
+        value = self.results.get(key)
+        if value is None:
+            value = compute()
+            self.results.put(key, value)
+        return value
+
+    def candidates(self, query_tokens: List[str], limit: Optional[int] = None,
+                   query_text: str = "") -> Candidates:
+        """Entries worth fuzzy scoring for a query, shortlisted on large corpora.
+
+        The shortlist is the BM25 top `limit` plus, when query_text is given, the
+        MinHash matches for its possibly misspelt words.
+        """
+        return self._shortlist(self._state, query_tokens, limit, query_text)
+
+    def shard_candidates(self, category: Optional[str], query_tokens: List[str],
+                         limit: Optional[int] = None, query_text: str = "") -> Candidates:
+        """Like candidates(), restricted to the questions of one category"""
+        shard = self.shards().get(category)
+        if shard is None:
+            return Candidates([], [], [])
+        return self._shortlist(shard, query_tokens, limit, query_text)
+
+    def shards(self) -> Dict[Optional[str], "_IndexState"]:
+        """One index state per category, built on first use"""
+        def build(entries):
+            by_category = defaultdict(list)
+            for entry in entries:
+                by_category[entry.category].append(entry)
+            return {category: _build_state(group) for category, group in by_category.items()}
+        return self.derived("shards", build)
+
+    def _shortlist(self, state: "_IndexState", query_tokens: List[str], limit: Optional[int],
+                   query_text: str) -> Candidates:
+        corpus = state.corpus
+        if limit is None:
+            limit = config.BM25_SHORTLIST_SIZE
+        if limit <= 0 or len(corpus.entries) <= limit:
+            return corpus
+        positions = state.bm25.top_n(query_tokens, limit)
+        # Only words BM25 cannot match as typed are worth a typo lookup
+        misspelt = [word for word in typo_words(query_text) if stem(word) not in state.bm25]
+        if misspelt and config.MINHASH_CANDIDATES > 0:
+            seen = set(positions)
+            for question_id in self.typos.query(misspelt, config.MINHASH_CANDIDATES):
+                position = state.positions.get(question_id)
+                if position is not None and position not in seen:
+                    positions.append(position)
+                    seen.add(position)
+        return Candidates(
+            [corpus.entries[i] for i in positions],
+            [corpus.tokens[i] for i in positions],
+            [corpus.questions[i] for i in positions],
+        )
+
+    def load(self, rows, version: int) -> bool:
+        """Bring the index up to date with rows read at kb_version `version`"""
+        with self._lock:
+            if version == self.version:
+                return False
+            self._rebuild(rows, version)
+        return True
+
+    def _rebuild(self, rows, version: int):
+        previous = {entry.row["id"]: entry for entry in self.entries}
+        entries = []
+        for row in rows:
+            text = self._text_for(row)
+            category = _category(row)
+            old = previous.get(row["id"])
+            if old is not None and old.text == text and old.category == category:
+                tokens, terms = old.tokens, old.terms
+            else:
+                tokens = " ".join(self._preprocess(text))
+                terms = tuple(tokens.split()) + tuple(self._preprocess(category or ""))
+            if old is None or old.text != text:
+                self.typos.add(row["id"], typo_words(text))
+            entries.append(IndexedQuestion(row, text, tokens, category, terms))
+        for question_id in previous.keys() - {entry.row["id"] for entry in entries}:
+            self.typos.remove(question_id)
+        self._state = _build_state(entries)
+        self.version = version
+        self.results.clear()
+
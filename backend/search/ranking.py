@@ -0,0 +1,51 @@
+import heapq
+from typing import Any, Callable, Iterable, Iterator, List
+
+
+class RankedMatches:
+    """Matches that are put in rank order only as far as they are read.
+
+    The matches are heapified in O(n) and popped on demand, so showing the first
+    page costs O(n + k log n) instead of a full sort, and deeper pages extend the
+    ranking lazily. len() is the total number of matches. Ties keep input order,
+    like the stable sort this replaces.
+    """
+
+    def __init__(self, matches: Iterable[Any], key: Callable[[Any], Any],
+                 value: Callable[[Any], Any] = lambda match: match):
+        self._heap = [(key(match), seq, match) for seq, match in enumerate(matches)]
+        heapq.heapify(self._heap)
+        self._total = len(self._heap)
+        self._ranked: List[Any] = []
+        self._value = value
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _extend(self, count: int):
+        while len(self._ranked) < count and self._heap:
+            self._ranked.append(heapq.heappop(self._heap)[2])
+
+    def best(self) -> Any:
+        """The top-ranked match as passed in, before the value projection"""
+        self._extend(1)
+        if not self._ranked:
+            raise IndexError("no matches")
+        return self._ranked[0]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._total)
+            self._extend(max(start, stop))
+            return [self._value(match) for match in self._ranked[item]]
+        if item < 0:
+            item += self._total
+        self._extend(item + 1)
+        return self._value(self._ranked[item])
+
+    def __iter__(self) -> Iterator[Any]:
+        position = 0
+        while position < self._total:
+            self._extend(position + 1)
+            yield self._value(self._ranked[position])
+            position += 1
@@ -0,0 +1,34 @@
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+import config
+
+# Weights of the advanced bot's blended score
+TOKEN_SET_WEIGHT = 0.4
+TOKEN_SORT_WEIGHT = 0.4
+PARTIAL_WEIGHT = 0.2
+
+
+def score_choices(query: str, choices: Sequence[str], scorer: Callable = fuzz.token_set_ratio,
+                  score_cutoff: float = 0) -> List[Tuple[int, float]]:
+    """(choice position, score) for every choice scoring at least score_cutoff, in choice order"""
+    hits = process.extract(query, choices, scorer=scorer, score_cutoff=score_cutoff, limit=None)
+    return sorted((position, score) for _, score, position in hits)
+
+
+def _all_scores(query: str, choices: Sequence[str], scorer: Callable, workers: int) -> np.ndarray:
+    return process.cdist([query], choices, scorer=scorer, dtype=np.float64, workers=workers)[0]
+
+
+def blended_scores(query_text: str, raw_query: str, token_choices: Sequence[str],
+                   question_choices: Sequence[str], workers: Optional[int] = None) -> List[float]:
+    """Weighted token_set/token_sort/partial blend of the advanced bot, one score per choice"""
+    if workers is None:
+        workers = config.SCORING_WORKERS
+    token_set = _all_scores(query_text, token_choices, fuzz.token_set_ratio, workers)
+    token_sort = _all_scores(query_text, token_choices, fuzz.token_sort_ratio, workers)
+    partial = _all_scores(raw_query, question_choices, fuzz.partial_ratio, workers)
+    return (token_set * TOKEN_SET_WEIGHT + token_sort * TOKEN_SORT_WEIGHT
+            + partial * PARTIAL_WEIGHT).tolist()
@@ -0,0 +1,63 @@
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+import config
+
+
+class ShardRouter:
+    """Picks the category shards a query should be scored against.
+
+    A stemmed term is a hint for a category when at least min_docs of its
+    questions use it and nearly every question using it is in that category.
+    Category names are part of every question's terms, so they always qualify.
+    """
+
+    def __init__(self, entries, min_docs: int = 2, min_share: float = 0.9):
+        by_term: Dict[str, Counter] = defaultdict(Counter)
+        self.categories: List[Optional[str]] = []
+        for entry in entries:
+            if entry.category not in self.categories:
+                self.categories.append(entry.category)
+            for term in set(entry.terms):
+                by_term[term][entry.category] += 1
+
+        self.hints: Dict[str, Optional[str]] = {}
+        for term, counts in by_term.items():
+            category, count = counts.most_common(1)[0]
+            if count >= min_docs and count >= min_share * sum(counts.values()):
+                self.hints[term] = category
+
+    def route(self, query_tokens: Iterable[str]) -> List[Optional[str]]:
+        """Categories hinted at by the query, every category when there is no hint"""
+        hinted = {self.hints[t] for t in query_tokens if t in self.hints}
+        if not hinted:
+            return list(self.categories)
+        return [category for category in self.categories if category in hinted]
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=config.SHARD_WORKERS,
+                                           thread_name_prefix="helpbot-shard")
+    return _pool
+
+
+def score_shards(categories: List[Optional[str]], score: Callable[[Optional[str]], list]) -> list:
+    """Matches of every category concatenated, shards scored concurrently.
+
+    rapidfuzz's batch scorers release the GIL, so shards do run in parallel.
+    Callers rank the merged list, e.g. through RankedMatches.
+    """
+    if len(categories) <= 1 or config.SHARD_WORKERS <= 1:
+        return [match for category in categories for match in score(category)]
+    futures = [_get_pool().submit(score, category) for category in categories]
+    return [match for future in futures for match in future.result()]
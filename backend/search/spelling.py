@@ -0,0 +1,102 @@
+import re
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from rapidfuzz.distance import OSA
+
+from search import nltk_resources
+
+_WORD = re.compile(r"\b[a-z]{4,}\b")
+
+
+class SymSpell:
+    """Symmetric-delete spelling corrector.
+
+    Every dictionary word is stored under all strings reachable by deleting up to
+    max_edit_distance characters from its prefix. A lookup generates the deletes
+    of the input the same way, so candidates come from a few dictionary probes
+    and only they get a real edit distance check.
+    """
+
+    def __init__(self, max_edit_distance: int = 2, prefix_length: int = 7):
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.words: Dict[str, int] = {}
+        self._deletes: Dict[str, List[str]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @staticmethod
+    def _edits(word: str, distance: int) -> Set[str]:
+        found = {word}
+        frontier = {word}
+        for _ in range(distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+            found |= frontier
+        return found
+
+    def add(self, word: str, count: int = 1):
+        if word in self.words:
+            self.words[word] += count
+            return
+        self.words[word] = count
+        for delete in self._edits(word[:self.prefix_length], self.max_edit_distance):
+            self._deletes[delete].append(word)
+
+    def lookup(self, word: str) -> Optional[str]:
+        """Closest dictionary word (fewest edits, then most frequent), None if none is close"""
+        if word in self.words:
+            return word
+        # At most one edit per four letters: a correctly spelled word missing from
+        # the dictionary ("cancel") is rarely that close to a different one ("panel")
+        max_distance = min(self.max_edit_distance, len(word) // 4)
+        candidates = set()
+        for delete in self._edits(word[:self.prefix_length], max_distance):
+            candidates.update(self._deletes.get(delete, ()))
+
+        best, best_rank = None, None
+        for candidate in candidates:
+            distance = OSA.distance(word, candidate, score_cutoff=max_distance)
+            if distance > max_distance:
+                continue
+            rank = (distance, -self.words[candidate], candidate)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = candidate, rank
+        return best
+
+    def correct(self, text: str, known: Optional[Callable[[str], bool]] = None) -> str:
+        """Replace unknown words of lower-cased text by their closest dictionary word.
+
+        Words for which known(word) is true, e.g. those that already match the
+        index as typed, are left alone.
+        """
+        stop_words = nltk_resources.stop_words()
+
+        def replace(match):
+            word = match.group(0)
+            if word in stop_words or (known is not None and known(word)):
+                return word
+            return self.lookup(word) or word
+
+        return _WORD.sub(replace, text)
+
+
+def build_speller(texts: Iterable[str], query_log: Iterable[str] = (), min_query_count: int = 3,
+                  max_edit_distance: int = 2) -> SymSpell:
+    """Dictionary of knowledge-base words, weighted up by how often users typed them.
+
+    Query terms only add to the count of a word already in the dictionary (once
+    typed min_query_count times): a misspelling users keep making must not become
+    a word that is never corrected.
+    """
+    speller = SymSpell(max_edit_distance)
+    stop_words = nltk_resources.stop_words()
+    for word, count in Counter(w for text in texts for w in _WORD.findall(text.lower())).items():
+        if word not in stop_words:
+            speller.add(word, count)
+    query_terms = Counter(w for text in query_log for w in _WORD.findall((text or "").lower()))
+    for word, count in query_terms.items():
+        if count >= min_query_count and word in speller.words:
+            speller.add(word, count)
+    return speller
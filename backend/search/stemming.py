@@ -0,0 +1,14 @@
+from functools import lru_cache
+
+from nltk.stem import PorterStemmer
+
+import config
+
+_stemmer = PorterStemmer()
+
+
+@lru_cache(maxsize=config.STEM_CACHE_SIZE)
+def stem(word: str) -> str:
+    """Porter stem of a word, memoised since NLTK's stemmer is pure Python"""
+    return _stemmer.stem(word)
+
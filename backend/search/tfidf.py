@@ -0,0 +1,63 @@
+import math
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class TfidfIndex:
+    """Sparse TF-IDF matrix over the preprocessed question corpus.
+
+    The matrix is stored column-major (CSC: one slice of document ids and
+    weights per term) with L2-normalised rows, so answering a query is one
+    sparse matrix-vector product over the query's terms yielding cosine
+    similarities, followed by a top-k selection.
+    """
+
+    def __init__(self, documents: Sequence[Iterable[str]]):
+        self.size = len(documents)
+        counts = [Counter(terms) for terms in documents]
+        df = Counter(term for terms in counts for term in terms)
+        # Smoothed idf, as in scikit-learn's TfidfVectorizer
+        self.idf = {term: math.log((1 + self.size) / (1 + n)) + 1 for term, n in df.items()}
+
+        columns: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for doc_id, terms in enumerate(counts):
+            weights = {term: tf * self.idf[term] for term, tf in terms.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            for term, weight in weights.items():
+                columns[term].append((doc_id, weight / norm))
+
+        self.vocabulary = {term: column for column, term in enumerate(columns)}
+        indptr, indices, data = array("q", [0]), array("q"), array("d")
+        for postings in columns.values():
+            for doc_id, weight in postings:
+                indices.append(doc_id)
+                data.append(weight)
+            indptr.append(len(indices))
+        self.indptr, self.indices, self.data = np.asarray(indptr), np.asarray(indices), np.asarray(data)
+
+    def query_vector(self, terms: Iterable[str]) -> Dict[int, float]:
+        """L2-normalised TF-IDF weights of the query, keyed by matrix column"""
+        counts = Counter(term for term in terms if term in self.vocabulary)
+        weights = {self.vocabulary[term]: tf * self.idf[term] for term, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {column: weight / norm for column, weight in weights.items()} if norm else {}
+
+    def search(self, terms: Iterable[str], k: int, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """(document position, cosine similarity) of the k most similar documents, best first"""
+        vector = self.query_vector(terms)
+        if not vector or k <= 0:
+            return []
+        spans = [np.arange(self.indptr[column], self.indptr[column + 1]) for column in vector]
+        positions = np.concatenate(spans)
+        weights = np.repeat([vector[column] for column in vector], [len(span) for span in spans])
+        scores = np.bincount(self.indices[positions], weights=self.data[positions] * weights,
+                             minlength=self.size)
+
+        hits = np.flatnonzero(scores >= max(min_score, np.finfo(float).tiny))
+        if len(hits) > k:
+            hits = np.sort(hits[np.argpartition(-scores[hits], k - 1)[:k]])
+        order = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in order]
@@ -0,0 +1,29 @@
+import os
+import shutil
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The FastAPI app on a fresh helpbot.db built from data.csv in a scratch directory.
+
+    DATABASE_URL and data.csv are relative to the working directory, which
+    therefore stays in the scratch directory until the session ends.
+    """
+    workdir = tmp_path_factory.mktemp("app")
+    shutil.copy(os.path.join(BACKEND_DIR, "data.csv"), workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main
+        yield main.app
+    finally:
+        os.chdir(cwd)
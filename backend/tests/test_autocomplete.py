@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from search.autocomplete import AutocompleteIndex
+
+WORDS = ["account", "billing", "cancel", "export", "password", "reset", "invoice", "plan", "profile", "privacy"]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(7)
+    rows = [
+        {"id": i, "question": " ".join(rng.sample(WORDS, rng.randint(2, 5))), "tags": "", "feedback": rng.randint(0, 5)}
+        for i in range(1, 401)
+    ]
+    popularity = {i: rng.randint(0, 20) for i in range(1, 401, 3)}
+    return rows, popularity
+
+
+def _brute_force(rows, popularity, query, limit):
+    *earlier, prefix = query.split()
+    ranked = sorted(rows, key=lambda r: (-popularity.get(r["id"], 0), -r["feedback"], r["id"]))
+    return [
+        row["id"] for row in ranked
+        if all(word in row["question"].split() for word in earlier)
+        and any(word.startswith(prefix) for word in row["question"].split())
+    ][:limit]
+
+
+@pytest.mark.parametrize("query", ["p", "pa", "account p", "billing reset p", "privacy plan i", "cancel x", "export zz"])
+def test_complete_matches_a_full_scan_in_rank_order(corpus, query):
+    rows, popularity = corpus
+    index = AutocompleteIndex(rows, popularity, top_k=10)
+    for limit in (1, 8):
+        assert [q["id"] for q in index.complete(query, limit)] == _brute_force(rows, popularity, query, limit)
+
+
+def test_unknown_earlier_word_matches_nothing(corpus):
+    index = AutocompleteIndex(*corpus)
+    assert index.complete("frobnicate p") == []
+    assert index.complete("") == []
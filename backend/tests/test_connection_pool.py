@@ -0,0 +1,33 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database
+
+
+def test_connection_closes_when_its_thread_exits(tmp_path):
+    pool = database.ConnectionPool(str(tmp_path / "helpbot.db"))
+    opened = []
+
+    def worker():
+        conn = pool.connection()
+        assert pool.connection() is conn
+        opened.append(conn)
+
+    for _ in range(5):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+    assert len(opened) == 5
+    assert len(pool) == 0
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+    # A live thread keeps its connection
+    conn = pool.connection()
+    assert len(pool) == 1 and pool.connection() is conn
+    pool.close_all()
+    assert len(pool) == 0
@@ -0,0 +1,68 @@
+import io
+import sqlite3
+
+import pytest
+
+import database
+from importer import import_questions
+
+HEADER = "id,question,answer,article_link,tags,feedback\n"
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "helpbot.db")
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def _import(conn, rows):
+    return import_questions(conn, io.StringIO(HEADER + rows))
+
+
+def _questions(conn):
+    return {row["id"]: dict(row) for row in conn.execute("SELECT * FROM questions")}
+
+
+def test_empty_feedback_takes_the_column_default(conn):
+    result = _import(conn, "1,How do I reset my password?,Reset it.,,account,\n2,How do I cancel?,Cancel it.,,billing,4\n")
+    assert (result.rows, result.skipped) == (2, 0)
+    assert {i: q["feedback"] for i, q in _questions(conn).items()} == {1: 0.0, 2: 4.0}
+
+
+def test_malformed_rows_are_skipped(conn):
+    result = _import(conn, "1,How do I reset my password?,Reset it.,,account,5\n"
+                           "x,Bad id,Answer,,tags,1\n"
+                           "3,Too,many,fields,here,1,2\n")
+    assert (result.rows, result.skipped) == (1, 2)
+    assert result.errors == ["line 3: invalid literal for int() with base 10: 'x'",
+                             "line 4: expected 6 fields, got 7"]
+    assert list(_questions(conn)) == [1]
+
+
+def test_reimport_upserts_by_id(conn):
+    _import(conn, "1,How do I reset my password?,Reset it.,,account,5\n2,How do I cancel?,Cancel it.,,billing,4\n")
+    conn.execute("UPDATE questions SET feedback = 2.5 WHERE id = 1")
+    conn.commit()
+    version = database.get_kb_version(conn)
+
+    result = _import(conn, "1,How do I reset my password?,Reset it.,,account,1\n"
+                           "2,How do I cancel my plan?,Cancel it.,,billing,1\n"
+                           "3,How do I export data?,Export it.,,data,3\n")
+
+    questions = _questions(conn)
+    assert result.rows == 3
+    assert questions[2]["question"] == "How do I cancel my plan?"
+    # Existing questions keep their live feedback, the file only seeds new ones
+    assert [questions[i]["feedback"] for i in (1, 2, 3)] == [2.5, 4.0, 3.0]
+    # Only the changed and the new row touched the table
+    assert database.get_kb_version(conn) == version + 2
+
+
+def test_migration_backfills_null_feedback(conn):
+    _import(conn, "1,How do I reset my password?,Reset it.,,account,5\n")
+    conn.execute("UPDATE questions SET feedback = NULL")
+    conn.execute("PRAGMA user_version = 6")
+    assert database.migrate(conn)[0] == 7
+    assert _questions(conn)[1]["feedback"] == 0.0
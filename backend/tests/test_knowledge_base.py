@@ -0,0 +1,36 @@
+import pytest
+
+import database
+from search.knowledge_base import KnowledgeBase
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = database.ConnectionPool(str(tmp_path / "helpbot.db"))
+    conn = pool.connection()
+    database.migrate(conn)
+    conn.executemany(
+        "INSERT INTO questions (id, question, answer, feedback) VALUES (?, ?, ?, ?)",
+        [(1, "How do I reset my password?", "Reset it.", 5.0), (2, "How do I cancel?", "Cancel it.", 3.0)],
+    )
+    conn.commit()
+    yield pool
+    pool.close_all()
+
+
+def test_votes_reach_the_snapshot_without_a_rebuild(pool):
+    # Reloads on every read, without the background job
+    knowledge_base = KnowledgeBase(pool, reload_seconds=0)
+    index = knowledge_base.index("default", str.split)
+    version = knowledge_base.snapshot.version
+
+    conn = pool.connection()
+    conn.execute("INSERT INTO feedback (question_id, feedback_score) VALUES (1, 1)")
+    conn.execute(database.UPDATE_FEEDBACK_AVERAGE, (1, 1, 1))
+    conn.commit()
+
+    snapshot = knowledge_base.snapshot
+    assert snapshot.version == version
+    assert knowledge_base.index("default", str.split) is index and index.version == version
+    assert snapshot.feedback_of(snapshot.questions[1]) == 1.0
+    assert snapshot.feedback_of(snapshot.questions[2]) == 3.0
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+
+import pytest
+from rapidfuzz import fuzz
+
+import config
+from importer import import_questions
+from reference.advance_test_bot_v1 import AdvancedHelpBot
+from reference.chatbot import analyze, match_questions, preprocess
+from search.question_index import QuestionIndex
+from tests.conftest import BACKEND_DIR
+
+QUESTIONS = [
+    (1, "How do I reset my password?", "account;password", 5.0),
+    (2, "How do I change my password?", "account;password", 4.0),
+    (3, "How do I cancel my subscription?", "billing", 3.0),
+    (4, "How do I export my data?", "data;export", 2.0),
+    (5, "Where can I download invoices?", "billing;invoice", 1.0),
+]
+
+
+@pytest.fixture
+def index():
+    index = QuestionIndex(preprocess)
+    index.load([
+        {"id": i, "question": q, "tags": tags, "category": None, "feedback": feedback, "answer": ""}
+        for i, q, tags, feedback in QUESTIONS
+    ], version=1)
+    return index
+
+
+def test_typo_lookup_gets_the_filler_free_query(index, monkeypatch):
+    seen = []
+    candidates = index.candidates
+
+    def recording_candidates(tokens, limit=None, query_text=""):
+        seen.append(query_text)
+        return candidates(tokens, limit, query_text)
+
+    monkeypatch.setattr(index, "candidates", recording_candidates)
+
+    # Both phrasings preprocess to the same tokens and so share a cache entry
+    match_questions("i want to reset pasword", index)
+    index.results.clear()
+    match_questions("reset pasword", index)
+    assert seen == ["reset pasword", "reset pasword"]
+
+
+@pytest.fixture(scope="module")
+def knowledge_base_rows():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    import_questions(conn, os.path.join(BACKEND_DIR, "data.csv"))
+    rows = [dict(row) for row in conn.execute("SELECT * FROM questions ORDER BY id")]
+    conn.close()
+    return rows
+
+
+def old_scoring_loop(user_input, rows):
+    # The scoring loop the shortlist and RankedMatches replaced: every question,
+    # token_set_ratio >= 50, sorted by score then feedback
+    input_tokens = preprocess(user_input)
+    matches = []
+    for row in rows:
+        question_tokens = preprocess(row["question"] + " " + row["tags"])
+        score = fuzz.token_set_ratio(" ".join(input_tokens), " ".join(question_tokens))
+        if score >= 50:
+            matches.append((score, row["feedback"], row))
+    matches.sort(key=lambda x: (-x[0], -x[1]))
+    return [row["id"] for _, _, row in matches]
+
+
+@pytest.mark.parametrize("query", [
+    "reset password", "how do i change my email", "sign up", "delete my account",
+    "export data to csv", "billing invoice", "payment methods", "notifications",
+])
+def test_ranking_matches_the_old_scoring_loop(query, knowledge_base_rows, monkeypatch):
+    monkeypatch.setattr(config, "SUGGEST_ENGINE", "fuzzy")
+    index = QuestionIndex(preprocess)
+    index.load(knowledge_base_rows, version=1)
+    assert len(knowledge_base_rows) <= config.BM25_SHORTLIST_SIZE  # whole corpus is scored
+
+    result = match_questions(query, index)
+    assert result["type"] == "match"
+    assert [row["id"] for row in result["results"]] == old_scoring_loop(query, knowledge_base_rows)
+
+
+def test_equal_scores_rank_by_live_feedback(index):
+    # Questions 1 and 2 score the same against "password"
+    ranked = match_questions("password", index)["results"]
+    assert [row["id"] for row in ranked][:2] == [1, 2]
+
+    live = {1: 1.0, 2: 4.5}
+    ranked = match_questions("password", index, feedback_of=lambda row: live.get(row["id"], row["feedback"]))["results"]
+    assert [(row["id"], row["feedback"]) for row in ranked][:2] == [(2, 4.5), (1, 1.0)]
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("hi", "greeting"),
+    ("good morning, i need help", "greeting"),
+    ("can you help", "help"),
+    ("i need help with my password", "help"),
+    ("this is a thing", None),  # "hi" inside "this"
+    ("the sushi menu", None),
+    ("that was helpful", None),  # "help" inside "helpful"
+    ("they", None),  # "hey" inside "they"
+])
+def test_analyze_keywords_sit_on_word_boundaries(text, intent):
+    assert analyze(text)[0] == intent
+
+
+def test_fillers_are_removed_wherever_they_occur():
+    assert analyze("i need help with exporting data")[1] == "exporting data"
+    # Overlapping fillers ("please help", "help me") are both cut
+    assert analyze("please help me reset it")[1] == "reset it"
+
+
+@pytest.fixture
+def advanced_bot(tmp_path):
+    bot = AdvancedHelpBot(str(tmp_path / "advanced.db"))
+    yield bot
+    bot.conn.close()
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("hello, can i speak to human", "greeting"),
+    ("speak to human, i need help", "escalation"),
+    ("help, this is terrible", "help"),
+    ("this is terrible", "negative_feedback"),
+    ("this is awful", "negative_feedback"),  # not a greeting for the "hi" in "this"
+    ("yo the manager please", "greeting"),
+    ("your export is broken", "question"),  # "yo" inside "your"
+    ("the guidelines say otherwise", "question"),  # "guide" inside "guidelines"
+])
+def test_advanced_intent_priority(advanced_bot, text, intent):
+    assert advanced_bot._detect_intent(text) == intent
@@ -0,0 +1,120 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import database
+
+BASELINE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "helpbot.db")
+
+# The hot queries the v2 indexes were added for, as the bots and jobs run them
+HOT_QUERIES = [
+    pytest.param(
+        """
+        SELECT q.question, q.category, COUNT(*) as freq
+        FROM query_log ql
+        JOIN questions q ON ql.matched_question_id = q.id
+        WHERE ql.session_id = ? AND ql.timestamp > datetime('now', '-1 day')
+        GROUP BY q.category
+        """,
+        ("session",), "idx_query_log_session", id="session-history",
+    ),
+    pytest.param(
+        """
+        SELECT question_id, SUM(feedback_score), COUNT(*) FROM feedback
+        WHERE question_id IS NOT NULL AND feedback_score IS NOT NULL GROUP BY question_id
+        """,
+        (), "idx_feedback_question", id="feedback-reconcile",
+    ),
+    pytest.param(
+        "SELECT id FROM query_log WHERE timestamp < datetime('now', ?) LIMIT ?",
+        ("-30 days", 1000), "idx_query_log_timestamp", id="log-retention",
+    ),
+]
+
+
+@pytest.fixture
+def migrated(tmp_path):
+    """A copy of the shipped, unversioned helpbot.db migrated to the latest schema"""
+    path = tmp_path / "helpbot.db"
+    shutil.copy(BASELINE_DB, path)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    yield conn, database.migrate(conn)
+    conn.close()
+
+
+def test_migrates_baseline_database_in_place(migrated):
+    conn, applied = migrated
+    baseline = sqlite3.connect(f"file:{BASELINE_DB}?mode=ro", uri=True)
+    try:
+        cursor = baseline.execute("SELECT * FROM questions ORDER BY id")
+        columns = [column[0] for column in cursor.description]
+        questions = cursor.fetchall()
+        logged = baseline.execute("SELECT COUNT(*) FROM query_log").fetchone()[0]
+    finally:
+        baseline.close()
+
+    assert applied == [version for version, _ in database.MIGRATIONS]
+    assert database.schema_version(conn) == database.MIGRATIONS[-1][0]
+    assert database.migrate(conn) == []
+    # Existing rows survive the upgrade, only new columns are added
+    migrated_questions = conn.execute("SELECT * FROM questions ORDER BY id").fetchall()
+    assert [tuple(row[name] for name in columns) for row in migrated_questions] == questions
+    assert conn.execute("SELECT COUNT(*) FROM query_log").fetchone()[0] == logged
+
+
+def test_concurrent_migrations_of_one_database(tmp_path):
+    path = tmp_path / "helpbot.db"
+    shutil.copy(BASELINE_DB, path)
+    first, second = sqlite3.connect(path), sqlite3.connect(path, timeout=10, check_same_thread=False)
+    outcome = {}
+
+    def migrate_second():
+        try:
+            outcome["applied"] = database.migrate(second)
+        except Exception as e:
+            outcome["error"] = e
+
+    # The first worker holds the write lock while it applies v1; the second
+    # starts meanwhile and must not build its v1 script from the old schema
+    first.execute("BEGIN IMMEDIATE")
+    thread = threading.Thread(target=migrate_second)
+    thread.start()
+    time.sleep(0.2)
+    for statement in database._statements(database.MIGRATIONS[0][1](first)):
+        first.execute(statement)
+    first.execute("PRAGMA user_version = 1")
+    first.commit()
+    thread.join()
+
+    assert "error" not in outcome, outcome.get("error")
+    assert outcome["applied"] == [version for version, _ in database.MIGRATIONS[1:]]
+    assert database.schema_version(first) == database.MIGRATIONS[-1][0]
+    first.close()
+    second.close()
+
+
+@pytest.mark.parametrize("sql, params, index", HOT_QUERIES)
+def test_hot_queries_use_their_index(migrated, sql, params, index):
+    conn, _ = migrated
+    plan = database.explain_query_plan(conn, sql, params)
+    assert any(index in step for step in plan), plan
+
+
+def test_rollup_window_covers_exactly_its_days(migrated):
+    conn, _ = migrated
+    conn.executescript("DELETE FROM daily_stats; DELETE FROM daily_sessions;")
+    # One query and one session on each of the last eight UTC days, today included
+    for age in range(8):
+        conn.execute("INSERT INTO daily_stats (day, queries) VALUES (date('now', ?), 1)", (f"-{age} days",))
+        conn.execute("INSERT INTO daily_sessions (day, session_id) VALUES (date('now', ?), ?)",
+                     (f"-{age} days", f"session-{age}"))
+
+    for days in (1, 7):
+        stats = database.rollup_analytics(conn, days)
+        assert stats["query_statistics"]["total_queries"] == days
+        assert stats["query_statistics"]["unique_sessions"] == days
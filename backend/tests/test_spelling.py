@@ -0,0 +1,22 @@
+from search.spelling import build_speller
+
+QUESTIONS = ["How do I reset my password?", "How do I cancel my subscription?", "Which panel shows billing?"]
+
+
+def test_repeated_misspellings_are_still_corrected():
+    speller = build_speller(QUESTIONS, ["pasword resett"] * 5, min_query_count=3)
+    assert "pasword" not in speller.words
+    assert speller.correct("pasword resett") == "password reset"
+
+
+def test_query_log_weights_knowledge_base_words():
+    # "flan" is one edit from both; "clan" is more frequent in the questions
+    texts = QUESTIONS + ["Which clan am I in?", "Can I leave my clan?", "Which plan am I on?"]
+    assert build_speller(texts).correct("flan") == "clan"
+    assert build_speller(texts, ["change plan"] * 3, min_query_count=3).correct("flan") == "plan"
+
+
+def test_words_that_already_match_are_left_alone():
+    speller = build_speller(QUESTIONS)
+    assert speller.correct("cancel subscription", known=lambda word: word in {"cancel", "subscript"}) \
+        == "cancel subscription"
@@ -0,0 +1,58 @@
+import pytest
+
+import database
+from write_behind import WriteBehindQueue
+
+INSERT_FEEDBACK = "INSERT INTO feedback (question_id, feedback_score) VALUES (?, ?)"
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = database.ConnectionPool(str(tmp_path / "helpbot.db"))
+    conn = pool.connection()
+    database.migrate(conn)
+    conn.executemany(
+        "INSERT INTO questions (id, question, answer) VALUES (?, ?, ?)",
+        [(1, "How do I reset my password?", "Reset it."), (2, "How do I cancel?", "Cancel it.")],
+    )
+    conn.commit()
+    yield pool
+    pool.close_all()
+
+
+def _feedback(pool, question_id):
+    return pool.connection().execute("SELECT feedback FROM questions WHERE id = ?", (question_id,)).fetchone()[0]
+
+
+def test_batch_runs_in_submission_order(pool):
+    # A long flush interval puts every statement in the same batch
+    write_queue = WriteBehindQueue(pool, flush_interval_ms=1000)
+    try:
+        write_queue.submit(INSERT_FEEDBACK, (1, 4))
+        write_queue.flush()
+        # The average update of question 1 comes first, then a vote on question 2
+        # and its average update: the second update must see that vote
+        write_queue.submit(database.UPDATE_FEEDBACK_AVERAGE, (1,) * 3)
+        write_queue.submit(INSERT_FEEDBACK, (2, 5))
+        write_queue.submit(database.UPDATE_FEEDBACK_AVERAGE, (2,) * 3)
+        write_queue.flush()
+    finally:
+        write_queue.close()
+
+    assert write_queue.batches == 2
+    assert _feedback(pool, 1) == 4.0
+    assert _feedback(pool, 2) == 5.0
+
+
+def test_failed_statement_does_not_lose_the_batch(pool):
+    write_queue = WriteBehindQueue(pool, flush_interval_ms=1000)
+    try:
+        write_queue.submit(INSERT_FEEDBACK, (1, 2))
+        write_queue.submit("INSERT INTO questions (id, question, answer) VALUES (1, 'duplicate', '')")
+        write_queue.submit(database.UPDATE_FEEDBACK_AVERAGE, (1,) * 3)
+        write_queue.flush()
+    finally:
+        write_queue.close()
+
+    assert _feedback(pool, 1) == 2.0
+    assert pool.connection().execute("SELECT COUNT(*) FROM questions").fetchone()[0] == 2
@@ -0,0 +1,157 @@
+"""Write-behind queue that group-commits the bots' log and counter writes.
+
+Query logs, feedback and view counts are appended to a bounded in-memory queue
+and a single writer thread commits them in batches, so a request never waits
+for an fsync. A batch is flushed every WRITE_FLUSH_INTERVAL_MS or as soon as
+WRITE_BATCH_SIZE statements are pending, whichever comes first. When the queue
+is full, submit() blocks until the writer catches up instead of dropping writes.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import config
+from database import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffers (sql, params) statements for one database and commits them in batches.
+
+    Within a batch, each run of consecutive statements with the same SQL text
+    goes to SQLite as one executemany, so statements still run in the order they
+    were submitted: a write queued after another one sees its effect.
+    """
+
+    def __init__(self, pool: ConnectionPool, flush_interval_ms: float = config.WRITE_FLUSH_INTERVAL_MS,
+                 batch_size: int = config.WRITE_BATCH_SIZE, max_pending: int = config.WRITE_QUEUE_SIZE):
+        self.pool = pool
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self.flushed = 0
+        self.batches = 0
+        self._thread = threading.Thread(target=self._run, name="helpbot-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params: Sequence = ()):
+        """Queue a statement; blocks only while the queue is full"""
+        if self._closed:
+            raise RuntimeError("write-behind queue is closed")
+        self._queue.put((sql, tuple(params)))
+
+    def flush(self):
+        """Wait until everything submitted so far is committed"""
+        self._queue.join()
+
+    def close(self):
+        """Commit what is pending and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> Dict:
+        return {"pending": self._queue.qsize(), "flushed": self.flushed, "batches": self.batches}
+
+    def _run(self):
+        while True:
+            batch: List[Tuple[str, tuple]] = []
+            stop = self._collect(batch)
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _collect(self, batch: List) -> bool:
+        """Fill batch until it is full or the flush interval ran out; True once stopped"""
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP:
+                return True
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return False
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return False
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                return False
+
+    def _write(self, batch: List[Tuple[str, tuple]]):
+        conn = self.pool.connection()
+        try:
+            with conn:
+                for sql, run in groupby(batch, key=itemgetter(0)):
+                    conn.executemany(sql, [params for _, params in run])
+        except Exception as e:
+            # One bad statement should not lose the whole batch: retry one by one
+            logger.error(f"Batched write failed ({e}), retrying statements individually")
+            for sql, params in batch:
+                try:
+                    with conn:
+                        conn.execute(sql, params)
+                except Exception as e:
+                    logger.error(f"Dropping write {sql.split()[0]} after error: {e}")
+        self.flushed += len(batch)
+        self.batches += 1
+
+
+_queues: Dict[str, WriteBehindQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_queue(db_path: str) -> Optional[WriteBehindQueue]:
+    """Process-wide queue for a database, None when HELPBOT_WRITE_BEHIND is off"""
+    if not config.WRITE_BEHIND:
+        return None
+    key = os.path.abspath(db_path)
+    with _queues_lock:
+        write_queue = _queues.get(key)
+        if write_queue is None:
+            write_queue = _queues[key] = WriteBehindQueue(get_pool(db_path))
+    return write_queue
+
+
+def write(conn, db_path: str, sql: str, params: Sequence = ()):
+    """Queue a statement for db_path, or run and commit it on conn when write-behind is off.
+
+    conn may also be a ConnectionPool, whose thread connection is then only taken
+    when the statement runs here.
+    """
+    write_queue = get_write_queue(db_path)
+    if write_queue is not None:
+        write_queue.submit(sql, params)
+        return
+    if isinstance(conn, ConnectionPool):
+        conn = conn.connection()
+    conn.execute(sql, params)
+    conn.commit()
+
+
+def close_write_queues():
+    """Flush and stop every queue; called on app shutdown and at interpreter exit"""
+    with _queues_lock:
+        queues = list(_queues.values())
+        _queues.clear()
+    for write_queue in queues:
+        write_queue.close()
+
+
+atexit.register(close_write_queues)
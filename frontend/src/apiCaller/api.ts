@@ -48,3 +48,11 @@ export const logQuery = (queryData: {
     user_name: "Test User",
   });
 };
+
+export const autocomplete = (query: string, limit: number = 8) => {
+  return api.get("/chatbot/autocomplete", { params: { q: query, limit } });
+};
+
+export const getAnalytics = (days: number = 7) => {
+  return api.get("/chatbot/analytics", { params: { days } });
+};